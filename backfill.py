@@ -0,0 +1,180 @@
+import asyncio
+from types import SimpleNamespace
+
+from telegram import Bot
+
+from config import ROUTES, TELEGRAM_TOKEN, logger
+from handlers import process_release_logic
+from tracing import release_trace, span
+from transfers import scheduler, file_priority, DOWN
+from utils import get_telethon_client, download_telethon_message
+import state_store
+
+# --- ДОПОМІЖНІ ФУНКЦІЇ ---
+
+def get_route(route_name=None):
+    """Знайти маршрут за назвою. Назву можна не вказувати, якщо маршрут один."""
+    if route_name is None:
+        if len(ROUTES) == 1:
+            return ROUTES[0]
+        raise ValueError(f"Вкажіть --route, доступні маршрути: {', '.join(r['name'] for r in ROUTES)}")
+    for route in ROUTES:
+        if route["name"] == route_name:
+            return route
+    raise ValueError(f"Маршрут {route_name} не знайдено, доступні: {', '.join(r['name'] for r in ROUTES)}")
+
+def is_zip_document(message):
+    """Повідомлення Telethon із zip-документом."""
+    return bool(
+        message.document and message.file and message.file.name
+        and message.file.name.lower().endswith('.zip')
+    )
+
+def history_fingerprint(message):
+    """
+    Відбиток документа з історії. Telethon не знає file_unique_id Bot API,
+    тому подальше редагування такого повідомлення перезавантажить файл.
+    """
+    return {
+        "name": message.file.name,
+        "file_unique_id": None,
+        "file_size": message.file.size
+    }
+
+async def extract_history_release_notes(client, route, message):
+    """
+    Те саме, що extract_release_notes, але для повідомлення Telethon:
+    спочатку текст повідомлення, на яке відповіли, потім підпис.
+    Повертає (опис, ID reply-повідомлення з описом або None).
+    """
+    reply = message.reply_to
+    if reply and reply.reply_to_msg_id:
+        # У топіку кожне повідомлення "відповідає" на його корінь — це не reply
+        is_topic_root = (
+            route["topic_id"] and reply.reply_to_msg_id == route["topic_id"]
+            and not reply.reply_to_top_id
+        )
+        if not is_topic_root:
+            replied = await client.get_messages(message.chat_id, ids=reply.reply_to_msg_id)
+            if replied and replied.message:
+                return replied.message, replied.id
+
+    return message.message or None, None
+
+# --- ІСТОРІЯ ТОПІКУ ---
+
+async def fetch_topic_groups(client, route, from_message_id, limit=None):
+    """
+    Забрати історію топіку від from_message_id (включно) пачками Telethon
+    і згрупувати zip-документи за media_group_id, як це робить buffer_document.
+    """
+    groups = {}
+    kwargs = {"reverse": True, "offset_id": from_message_id - 1, "limit": limit}
+    if route["topic_id"]:
+        kwargs["reply_to"] = route["topic_id"]
+
+    async for message in client.iter_messages(route["group_id"], **kwargs):
+        if not is_zip_document(message):
+            continue
+        if message.grouped_id:
+            group_id = f"group_{message.grouped_id}"
+        else:
+            group_id = f"single_{message.id}"
+        groups.setdefault(group_id, []).append(message)
+
+    # Релізи створюються в порядку публікації
+    return sorted(
+        (sorted(messages, key=lambda m: m.id) for messages in groups.values()),
+        key=lambda messages: messages[0].id
+    )
+
+async def download_group(client, messages):
+    """
+    Паралельно завантажити документи групи. Кількість одночасних завантажень,
+    черговість і смугу визначає планувальник передач (transfers.max_concurrent_downloads).
+    """
+    async def download_one(message):
+        file_name = message.file.name
+        async with scheduler.transfer(DOWN, file_name) as transfer:
+            with span("download", file=file_name, size=message.file.size) as download_span:
+                file_info = await download_telethon_message(client, message, file_name, transfer=transfer)
+                if not file_info: download_span.fail()
+        if file_info:
+            file_info["message_id"] = message.id
+            file_info["fingerprint"] = history_fingerprint(message)
+        else:
+            logger.error(f"Download failed {file_name} (message {message.id})")
+        return file_info
+
+    # Як і в download_messages: пріоритетні файли першими просять слот
+    tasks = {
+        message.id: asyncio.create_task(download_one(message))
+        for message in sorted(messages, key=lambda m: file_priority(m.file.name))
+    }
+    results = await asyncio.gather(*(tasks[message.id] for message in messages))
+    return [file_info for file_info in results if file_info]
+
+# --- ГОЛОВНА ФУНКЦІЯ ---
+
+async def run_backfill(route_name, from_message_id, dry_run=False, limit=None):
+    """
+    Пройти історію топіку маршруту від from_message_id і провести кожну
+    групу файлів через звичайний конвеєр релізу, пропускаючи вже опубліковані.
+    """
+    route = get_route(route_name)
+    client = await get_telethon_client()
+    bot = None
+    processed = skipped = 0
+    try:
+        groups = await fetch_topic_groups(client, route, from_message_id, limit)
+        logger.info(f"Backfill {route['name']}: знайдено {len(groups)} груп з повідомлення {from_message_id}")
+
+        if not dry_run:
+            bot = Bot(TELEGRAM_TOKEN)
+            await bot.initialize()
+        # process_release_logic потребує лише context.bot
+        context = SimpleNamespace(bot=bot, bot_data={})
+
+        for messages in groups:
+            main_msg = messages[0]
+            names = [message.file.name for message in messages]
+
+            # Ідемпотентність: повідомлення вже прив'язане до релізу
+            if any(state_store.find_release_message_id(route, message.id) is not None for message in messages):
+                logger.info(f"Backfill: повідомлення {main_msg.id} вже опубліковано, пропускаємо")
+                skipped += 1
+                continue
+
+            release_notes, notes_message_id = await extract_history_release_notes(client, route, main_msg)
+            version = main_msg.date.astimezone().strftime("%Y.%m.%d-%H.%M")
+
+            if dry_run:
+                notes_preview = (release_notes or "").strip().splitlines()[:1]
+                logger.info(
+                    f"[dry-run] {main_msg.id}: v{version} {', '.join(names)}"
+                    + (f" — {notes_preview[0]}" if notes_preview else "")
+                )
+                processed += 1
+                continue
+
+            with release_trace(route, main_msg.id, "backfill"):
+                await bot.send_message(
+                    chat_id=route["log_chat_id"],
+                    text=f"📥 Backfill: повідомлення {main_msg.id} ({len(messages)} файл(ів)). Починаю завантаження..."
+                )
+                downloaded_files = await download_group(client, messages)
+                if not downloaded_files:
+                    await bot.send_message(chat_id=route["log_chat_id"], text="❌ Жоден файл не завантажився.")
+                    continue
+                await process_release_logic(
+                    context, route, downloaded_files, release_notes, main_msg.id,
+                    version=version, notes_message_id=notes_message_id
+                )
+            processed += 1
+    finally:
+        if bot:
+            await bot.shutdown()
+        # Інакше CLI завершується з незакритими задачами Telethon
+        await client.disconnect()
+
+    logger.info(f"Backfill {route['name']} завершено: оброблено {processed}, пропущено {skipped}")
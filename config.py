@@ -8,41 +8,370 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Завантаження конфігурації
-def load_config():
+CONFIG_PATH = 'config.json'
+
+# Важливі файли, які потрібно включити в кожний реліз (якщо не задано в конфігурації)
+DEFAULT_REQUIRED_FILES = ["AIO.zip", "4IFIX.zip", "4IFIB.zip", "4IFIR.zip"]
+
+# Як часто перевіряти, чи змінився файл конфігурації (секунди)
+CONFIG_WATCH_INTERVAL_SEC = 5
+
+class ConfigError(Exception):
+    """Помилки конфігурації, зібрані всі разом."""
+
+    def __init__(self, errors):
+        self.errors = list(errors)
+        super().__init__("\n".join(f" - {error}" for error in self.errors))
+
+# --- ВАЛІДАЦІЯ ---
+
+def _is_id(value):
+    """Telegram/GitHub ID: ціле число або рядок з цілим числом."""
+    if isinstance(value, bool):
+        return False
+    if isinstance(value, int):
+        return True
+    return isinstance(value, str) and value.lstrip("-").isdigit()
+
+def _is_count(value):
+    return isinstance(value, int) and not isinstance(value, bool) and value >= 0
+
+def _is_positive_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and value > 0
+
+def _is_str_list(value):
+    return isinstance(value, list) and all(isinstance(item, str) for item in value)
+
+# Перевірки полів: (тип для повідомлення, функція перевірки)
+ID = ("ціле число (ID)", _is_id)
+STR = ("рядок", lambda value: isinstance(value, str) and value != "")
+BOOL = ("true/false", lambda value: isinstance(value, bool))
+COUNT = ("ціле число >= 0", _is_count)
+POSITIVE_INT = ("ціле число >= 1", lambda value: _is_count(value) and value >= 1)
+POSITIVE = ("число > 0", _is_positive_number)
+STR_LIST = ("список рядків", _is_str_list)
+
+def _check_fields(errors, data, prefix, fields, required=()):
+    """Перевірити поля секції; required — обов'язкові."""
+    for key in required:
+        if data.get(key) is None:
+            errors.append(f"{prefix}{key}: обов'язкове поле відсутнє")
+    for key, (kind, check) in fields.items():
+        if data.get(key) is not None and not check(data[key]):
+            errors.append(f"{prefix}{key}: очікується {kind}, отримано {json.dumps(data[key], ensure_ascii=False)}")
+
+def _section(errors, raw, name):
+    value = raw.get(name, {})
+    if not isinstance(value, dict):
+        errors.append(f"{name}: має бути об'єктом")
+        return {}
+    return value
+
+ROUTE_FIELDS = {
+    "name": STR, "group_id": ID, "topic_id": ID, "log_chat_id": ID,
+    "owner": STR, "repo": STR, "token": STR, "release_name": STR,
+    "required_files": STR_LIST, "checker_script": STR, "max_concurrent_releases": POSITIVE_INT
+}
+
+def validate_config(raw):
+    """Перевірити всю конфігурацію і повернути список помилок (порожній — все гаразд)."""
+    if not isinstance(raw, dict):
+        return ["конфігурація має бути JSON-об'єктом"]
+    errors = []
+
+    telegram = _section(errors, raw, "telegram")
+    github = _section(errors, raw, "github")
+    has_routes = "routes" in raw
+
+    _check_fields(
+        errors, telegram, "telegram.",
+        {"token": STR, "api_id": ID, "api_hash": STR, "group_id": ID, "topic_id": ID, "log_chat_id": ID},
+        required=("token", "log_chat_id") + (() if has_routes else ("group_id",))
+    )
+    _check_fields(
+        errors, github, "github.",
+        {"token": STR, "owner": STR, "repo": STR},
+        required=("token",) + (() if has_routes else ("owner", "repo"))
+    )
+    _check_fields(errors, _section(errors, raw, "release"), "release.",
+                  {"file_pattern": STR, "required_files": STR_LIST})
+    _check_fields(errors, _section(errors, raw, "features"), "features.", {
+        "enable_github_release": BOOL, "enable_checker_script": BOOL, "enable_file_download": BOOL,
+        "enable_release_tracing": BOOL, "enable_profiling": BOOL, "enable_config_watch": BOOL
+    })
+    _check_fields(errors, _section(errors, raw, "paths"), "paths.", {
+        "checker_script": STR, "state_db": STR, "trace_file": STR, "profile_dir": STR
+    })
+    _check_fields(errors, _section(errors, raw, "profiling"), "profiling.",
+                  {"slow_callback_ms": POSITIVE, "sample_interval_ms": POSITIVE})
+    _check_fields(errors, _section(errors, raw, "transfers"), "transfers.", {
+        "upload_kib_per_sec": COUNT, "download_kib_per_sec": COUNT,
+        "max_concurrent_uploads": COUNT, "max_concurrent_downloads": COUNT,
+        "priority_files": STR_LIST
+    })
+
+    if has_routes:
+        routes = raw["routes"]
+        if not isinstance(routes, list) or not routes:
+            errors.append("routes: має бути непорожнім списком")
+            routes = []
+        names = set()
+        targets = set()
+        for index, route_config in enumerate(routes):
+            prefix = f"routes[{index}]."
+            if not isinstance(route_config, dict):
+                errors.append(f"routes[{index}]: має бути об'єктом")
+                continue
+            _check_fields(errors, route_config, prefix, ROUTE_FIELDS, required=("group_id", "owner", "repo"))
+            name = route_config.get("name") or f"{route_config.get('owner')}/{route_config.get('repo')}"
+            if name in names:
+                errors.append(f"{prefix}name: маршрут {name} вже визначено")
+            names.add(name)
+            target = (str(route_config.get("group_id")), str(route_config.get("topic_id")))
+            if target in targets:
+                errors.append(f"routes[{index}]: група {target[0]} і топік {target[1]} вже обслуговуються іншим маршрутом")
+            targets.add(target)
+
+    return errors
+
+def load_config(path=CONFIG_PATH):
+    """Прочитати та перевірити конфігурацію. Кидає ConfigError з усіма помилками."""
     try:
-        with open('config.json', 'r', encoding='utf-8') as config_file:
-            return json.load(config_file)
-    except Exception as e:
-        logger.error(f"Помилка завантаження конфігурації: {e}")
-        raise
+        with open(path, 'r', encoding='utf-8') as config_file:
+            raw = json.load(config_file)
+    except FileNotFoundError:
+        raise ConfigError([f"файл конфігурації {path} не знайдено"])
+    except json.JSONDecodeError as e:
+        raise ConfigError([f"{path}: некоректний JSON ({e})"])
+    errors = validate_config(raw)
+    if errors:
+        raise ConfigError(errors)
+    return raw
+
+# --- НАЛАШТУВАННЯ ---
+
+def build_route(route_config, settings):
+    """Зібрати маршрут з конфігурації, підставляючи глобальні значення за замовчуванням."""
+    return {
+        "name": route_config.get("name") or f"{route_config['owner']}/{route_config['repo']}",
+        "group_id": int(route_config["group_id"]),
+        "topic_id": int(route_config["topic_id"]) if route_config.get("topic_id") else None,
+        "log_chat_id": route_config.get("log_chat_id", settings["TELEGRAM_LOG_CHAT_ID"]),
+        "owner": route_config["owner"],
+        "repo": route_config["repo"],
+        "token": route_config.get("token", settings["GITHUB_TOKEN"]),
+        "release_name": route_config.get("release_name", "4IFIR"),
+        "required_files": route_config.get("required_files", settings["REQUIRED_FILES"]),
+        "checker_script": route_config.get("checker_script", settings["CHECKER_SCRIPT_PATH"]),
+        "max_concurrent_releases": int(route_config.get("max_concurrent_releases", 1))
+    }
+
+def read_settings(raw):
+    """Значення модульних налаштувань з (уже перевіреної) конфігурації."""
+    telegram = raw.get("telegram", {})
+    github = raw.get("github", {})
+    features = raw.get("features", {})
+    paths = raw.get("paths", {})
+    profiling = raw.get("profiling", {})
+    transfers = raw.get("transfers", {})
+
+    settings = {
+        # Bot API
+        "TELEGRAM_TOKEN": telegram.get("token"),
+        "TELEGRAM_GROUP_ID": telegram.get("group_id"),
+        "TELEGRAM_TOPIC_ID": telegram.get("topic_id"),
+        "TELEGRAM_LOG_CHAT_ID": telegram["log_chat_id"],
+        # Telethon
+        "API_ID": telegram.get("api_id"),
+        "API_HASH": telegram.get("api_hash"),
+        # GitHub
+        "GITHUB_TOKEN": github["token"],
+        "GITHUB_OWNER": github.get("owner"),
+        "GITHUB_REPO": github.get("repo"),
+        "RELEASE_FILE_PATTERN": raw.get("release", {}).get("file_pattern", "*.zip"),
+        "REQUIRED_FILES": raw.get("release", {}).get("required_files", DEFAULT_REQUIRED_FILES),
+        # Опції для увімкнення/вимкнення функціоналу
+        "ENABLE_GITHUB_RELEASE": features.get("enable_github_release", True),
+        "ENABLE_CHECKER_SCRIPT": features.get("enable_checker_script", True),
+        "ENABLE_FILE_DOWNLOAD": features.get("enable_file_download", True),
+        "ENABLE_RELEASE_TRACING": features.get("enable_release_tracing", True),
+        "ENABLE_PROFILING": features.get("enable_profiling", False),
+        "ENABLE_CONFIG_WATCH": features.get("enable_config_watch", True),
+        # Шлях до скрипта перевірки
+        "CHECKER_SCRIPT_PATH": paths.get("checker_script", "/home/xhr/4ifir-checker/run_checker.sh"),
+        # Шлях до бази стану (message_id -> реліз)
+        "STATE_DB_PATH": paths.get("state_db", "release_state.db"),
+        # Trace релізів (JSONL) та результати профілювання
+        "TRACE_FILE_PATH": paths.get("trace_file", "release_traces.jsonl"),
+        "PROFILE_DIR": paths.get("profile_dir", "profiles"),
+        "SLOW_CALLBACK_MS": profiling.get("slow_callback_ms", 100),
+        "PROFILE_SAMPLE_INTERVAL_MS": profiling.get("sample_interval_ms", 5),
+        # Планувальник передач: ліміти смуги (КіБ/с, 0 — без обмежень), одночасні передачі
+        # та файли з найвищим пріоритетом (у порядку важливості)
+        "UPLOAD_LIMIT_KIB": transfers.get("upload_kib_per_sec", 0),
+        "DOWNLOAD_LIMIT_KIB": transfers.get("download_kib_per_sec", 0),
+        "MAX_CONCURRENT_UPLOADS": transfers.get("max_concurrent_uploads", 2),
+        "MAX_CONCURRENT_DOWNLOADS": transfers.get("max_concurrent_downloads", 2),
+        "PRIORITY_FILES": transfers.get("priority_files", ["4IFIR.zip"]),
+    }
+
+    # Маршрути: топік Telegram -> репозиторій GitHub.
+    # Без секції "routes" використовується один маршрут зі старих полів конфігурації.
+    if "routes" in raw:
+        settings["ROUTES"] = [build_route(route_config, settings) for route_config in raw["routes"]]
+    else:
+        settings["ROUTES"] = [build_route({
+            "name": "default",
+            "group_id": settings["TELEGRAM_GROUP_ID"],
+            "topic_id": settings["TELEGRAM_TOPIC_ID"],
+            "owner": settings["GITHUB_OWNER"],
+            "repo": settings["GITHUB_REPO"]
+        }, settings)]
+    return settings
+
+# Налаштування, зміна яких потребує перезапуску (з'єднання, сесії, файли стану)
+STRUCTURAL_SETTINGS = {
+    "TELEGRAM_TOKEN", "TELEGRAM_GROUP_ID", "TELEGRAM_TOPIC_ID", "API_ID", "API_HASH",
+    "GITHUB_TOKEN", "GITHUB_OWNER", "GITHUB_REPO", "STATE_DB_PATH", "TRACE_FILE_PATH", "PROFILE_DIR"
+}
+# Поля маршруту, що визначають, який топік і репозиторій він обслуговує
+STRUCTURAL_ROUTE_KEYS = ("name", "group_id", "topic_id", "owner", "repo", "token")
 
 # Глобальна конфігурація
-CONFIG = load_config()
-
-# Отримання значень з конфігурації для Bot API
-TELEGRAM_TOKEN = CONFIG.get("telegram", {}).get("token")
-TELEGRAM_GROUP_ID = CONFIG["telegram"]["group_id"]
-TELEGRAM_TOPIC_ID = CONFIG["telegram"]["topic_id"]
-TELEGRAM_LOG_CHAT_ID = CONFIG["telegram"]["log_chat_id"]
-
-# Отримання значень з конфігурації для Telethon
-API_ID = CONFIG.get("telegram", {}).get("api_id")
-API_HASH = CONFIG.get("telegram", {}).get("api_hash")
-
-# GitHub конфігурація
-GITHUB_TOKEN = CONFIG["github"]["token"]
-GITHUB_OWNER = CONFIG["github"]["owner"]
-GITHUB_REPO = CONFIG["github"]["repo"]
-RELEASE_FILE_PATTERN = CONFIG["release"]["file_pattern"]
-
-# Опції для увімкнення/вимкнення функціоналу
-ENABLE_GITHUB_RELEASE = CONFIG.get("features", {}).get("enable_github_release", True)
-ENABLE_CHECKER_SCRIPT = CONFIG.get("features", {}).get("enable_checker_script", True)
-ENABLE_FILE_DOWNLOAD = CONFIG.get("features", {}).get("enable_file_download", True)
-
-# Шлях до скрипта перевірки
-CHECKER_SCRIPT_PATH = CONFIG.get("paths", {}).get("checker_script", "/home/xhr/4ifir-checker/run_checker.sh")
-
-# Важливі файли, які потрібно включити в кожний реліз
-REQUIRED_FILES = ["AIO.zip", "4IFIX.zip", "4IFIB.zip", "4IFIR.zip"]
\ No newline at end of file
+try:
+    CONFIG = load_config()
+except ConfigError as e:
+    logger.error(f"Некоректна конфігурація {CONFIG_PATH}:\n{e}")
+    raise SystemExit(1)
+_settings = read_settings(CONFIG)
+
+# Bot API
+TELEGRAM_TOKEN = _settings["TELEGRAM_TOKEN"]
+TELEGRAM_GROUP_ID = _settings["TELEGRAM_GROUP_ID"]
+TELEGRAM_TOPIC_ID = _settings["TELEGRAM_TOPIC_ID"]
+
+# Telethon
+API_ID = _settings["API_ID"]
+API_HASH = _settings["API_HASH"]
+
+# GitHub
+GITHUB_TOKEN = _settings["GITHUB_TOKEN"]
+GITHUB_OWNER = _settings["GITHUB_OWNER"]
+GITHUB_REPO = _settings["GITHUB_REPO"]
+
+# Файли стану
+STATE_DB_PATH = _settings["STATE_DB_PATH"]
+TRACE_FILE_PATH = _settings["TRACE_FILE_PATH"]
+PROFILE_DIR = _settings["PROFILE_DIR"]
+
+# Маршрути (оновлюються на місці при перечитуванні)
+ROUTES = _settings["ROUTES"]
+
+def apply_reloadable_settings(settings):
+    """Присвоїти налаштування, які можна змінювати без перезапуску."""
+    global TELEGRAM_LOG_CHAT_ID, RELEASE_FILE_PATTERN, REQUIRED_FILES
+    global ENABLE_GITHUB_RELEASE, ENABLE_CHECKER_SCRIPT, ENABLE_FILE_DOWNLOAD
+    global ENABLE_RELEASE_TRACING, ENABLE_PROFILING, ENABLE_CONFIG_WATCH
+    global CHECKER_SCRIPT_PATH, SLOW_CALLBACK_MS, PROFILE_SAMPLE_INTERVAL_MS
+    global UPLOAD_LIMIT_KIB, DOWNLOAD_LIMIT_KIB, MAX_CONCURRENT_UPLOADS, MAX_CONCURRENT_DOWNLOADS, PRIORITY_FILES
+
+    TELEGRAM_LOG_CHAT_ID = settings["TELEGRAM_LOG_CHAT_ID"]
+    RELEASE_FILE_PATTERN = settings["RELEASE_FILE_PATTERN"]
+    REQUIRED_FILES = settings["REQUIRED_FILES"]
+
+    # Опції для увімкнення/вимкнення функціоналу
+    ENABLE_GITHUB_RELEASE = settings["ENABLE_GITHUB_RELEASE"]
+    ENABLE_CHECKER_SCRIPT = settings["ENABLE_CHECKER_SCRIPT"]
+    ENABLE_FILE_DOWNLOAD = settings["ENABLE_FILE_DOWNLOAD"]
+    ENABLE_RELEASE_TRACING = settings["ENABLE_RELEASE_TRACING"]
+    ENABLE_PROFILING = settings["ENABLE_PROFILING"]
+    ENABLE_CONFIG_WATCH = settings["ENABLE_CONFIG_WATCH"]
+
+    # Скрипт перевірки та профілювання
+    CHECKER_SCRIPT_PATH = settings["CHECKER_SCRIPT_PATH"]
+    SLOW_CALLBACK_MS = settings["SLOW_CALLBACK_MS"]
+    PROFILE_SAMPLE_INTERVAL_MS = settings["PROFILE_SAMPLE_INTERVAL_MS"]
+
+    # Планувальник передач
+    UPLOAD_LIMIT_KIB = settings["UPLOAD_LIMIT_KIB"]
+    DOWNLOAD_LIMIT_KIB = settings["DOWNLOAD_LIMIT_KIB"]
+    MAX_CONCURRENT_UPLOADS = settings["MAX_CONCURRENT_UPLOADS"]
+    MAX_CONCURRENT_DOWNLOADS = settings["MAX_CONCURRENT_DOWNLOADS"]
+    PRIORITY_FILES = settings["PRIORITY_FILES"]
+
+apply_reloadable_settings(_settings)
+
+# --- ПЕРЕЧИТУВАННЯ ---
+
+# Функції, які викликаються після успішного перечитування конфігурації
+RELOAD_CALLBACKS = []
+
+def on_reload(callback):
+    """Зареєструвати функцію, яка застосовує нові налаштування (декоратор)."""
+    RELOAD_CALLBACKS.append(callback)
+    return callback
+
+def reload_config(path=CONFIG_PATH):
+    """
+    Перечитати конфігурацію без перезапуску.
+    Несуттєві для з'єднань налаштування (функції, REQUIRED_FILES, скрипт
+    перевірки, ліміти) оновлюються на місці; для структурних змін лише
+    виводиться попередження. Некоректний файл не застосовується зовсім.
+    Повертає True, якщо конфігурацію застосовано.
+    """
+    global CONFIG, _settings
+    try:
+        raw = load_config(path)
+    except ConfigError as e:
+        logger.error(f"Конфігурацію не перечитано, працюємо з попередньою:\n{e}")
+        return False
+
+    settings = read_settings(raw)
+    new_routes = settings.pop("ROUTES")
+    changed = []
+    needs_restart = []
+
+    for name, value in settings.items():
+        if _settings[name] == value:
+            continue
+        if name in STRUCTURAL_SETTINGS:
+            # Структурні значення лишаються старими до перезапуску
+            settings[name] = _settings[name]
+            needs_restart.append(name)
+        else:
+            changed.append(name)
+    apply_reloadable_settings(settings)
+    settings["ROUTES"] = ROUTES
+    _settings = settings
+
+    # Маршрути оновлюються на місці (за назвою), бо на них посилаються буфери й задачі
+    new_by_name = {route["name"]: route for route in new_routes}
+    if [route["name"] for route in new_routes] != [route["name"] for route in ROUTES]:
+        needs_restart.append("ROUTES")
+    for route in ROUTES:
+        new_route = new_by_name.get(route["name"])
+        if new_route is None:
+            continue
+        for key, value in new_route.items():
+            if route[key] == value:
+                continue
+            if key in STRUCTURAL_ROUTE_KEYS:
+                needs_restart.append(f"ROUTES[{route['name']}].{key}")
+            else:
+                route[key] = value
+                changed.append(f"ROUTES[{route['name']}].{key}")
+
+    CONFIG = raw
+    for callback in RELOAD_CALLBACKS:
+        try:
+            callback()
+        except Exception as e:
+            logger.error(f"Error applying reloaded config in {callback.__name__}: {e}")
+
+    if changed:
+        logger.info(f"Конфігурацію перечитано, оновлено: {', '.join(changed)}")
+    else:
+        logger.info("Конфігурацію перечитано, змін немає")
+    if needs_restart:
+        logger.warning(f"Для застосування змін потрібен перезапуск: {', '.join(needs_restart)}")
+    return True
@@ -1,47 +1,68 @@
-import requests
 import tempfile
 import logging
 from datetime import datetime
 import os
 
-from config import (
-    GITHUB_TOKEN, GITHUB_OWNER, GITHUB_REPO, 
-    REQUIRED_FILES, logger
-)
+from config import logger
+from tracing import span
+from transfers import scheduler, ThrottledFile, UP, DOWN
+
+# Спільна сесія: пул з'єднань до GitHub для всіх маршрутів.
+# requests імпортується при першому запиті, щоб не сповільнювати старт.
+_session = None
+
+def get_session():
+    """Get or create the shared requests session."""
+    global _session
+
+    if _session is None:
+        import requests
+        _session = requests.Session()
+
+    return _session
+
+def github_headers(route, accept="application/vnd.github+json"):
+    """Заголовки запитів до GitHub API для маршруту."""
+    return {
+        "Accept": accept,
+        "Authorization": f"Bearer {route['token']}",
+        "X-GitHub-Api-Version": "2022-11-28"
+    }
+
+def download_badge(route, tag):
+    """Плашка з лічильником завантажень релізу."""
+    return f"![GitHub release (latest by date)](https://img.shields.io/github/downloads/{route['owner']}/{route['repo']}/{tag}/total)\n\n"
 
 def add_file_to_release(upload_url, file_path, file_name, headers):
     """Додати файл до існуючого релізу."""
-    try:
-        with open(file_path, 'rb') as file:
-            upload_headers = headers.copy()
-            upload_headers["Content-Type"] = "application/zip"
+    with span("upload", file=file_name) as upload_span:
+        try:
+            with scheduler.transfer_sync(UP, file_name) as transfer, open(file_path, 'rb') as file:
+                upload_headers = headers.copy()
+                upload_headers["Content-Type"] = "application/zip"
+                
+                upload_response = get_session().post(
+                    f"{upload_url}?name={file_name}",
+                    headers=upload_headers,
+                    data=ThrottledFile(file, transfer)
+                )
+                upload_response.raise_for_status()
             
-            upload_response = requests.post(
-                f"{upload_url}?name={file_name}",
-                headers=upload_headers,
-                data=file
-            )
-            upload_response.raise_for_status()
-        
-        logger.info(f"Файл {file_name} успішно додано до релізу")
-        return True
-    except Exception as e:
-        logger.error(f"Помилка додавання файлу {file_name} до релізу: {e}")
-        return False
+            logger.info(f"Файл {file_name} успішно додано до релізу")
+            return upload_response.json()
+        except Exception as e:
+            logger.error(f"Помилка додавання файлу {file_name} до релізу: {e}")
+            upload_span.fail(e)
+            return None
 
-def get_all_releases():
+def get_all_releases(route):
     """Отримати всі релізи з GitHub."""
     try:
-        releases_url = f"https://api.github.com/repos/{GITHUB_OWNER}/{GITHUB_REPO}/releases"
-        
-        headers = {
-            "Accept": "application/vnd.github+json",
-            "Authorization": f"Bearer {GITHUB_TOKEN}",
-            "X-GitHub-Api-Version": "2022-11-28"
-        }
+        releases_url = f"https://api.github.com/repos/{route['owner']}/{route['repo']}/releases"
         
-        response = requests.get(releases_url, headers=headers)
-        response.raise_for_status()
+        with span("list_releases"):
+            response = get_session().get(releases_url, headers=github_headers(route))
+            response.raise_for_status()
         
         releases = response.json()
         if not releases:
@@ -53,34 +74,49 @@ def get_all_releases():
         logger.error(f"Помилка отримання релізів: {e}")
         return []
 
-def get_latest_release():
+def get_latest_release(route):
     """Отримати останній реліз з GitHub."""
-    releases = get_all_releases()
+    releases = get_all_releases(route)
     if releases:
         # Останній реліз - перший у списку
         return releases[0]
     return None
 
-def download_asset_from_github(asset_url, file_name):
+def build_release_data(route, release_id, tag_name, html_url, assets):
+    """
+    Зібрати дані релізу з локального стану, без запиту до GitHub.
+    assets: {name: {"asset_id": ...}}
+    """
+    return {
+        "id": release_id,
+        "tag_name": tag_name,
+        "html_url": html_url,
+        "url": f"https://api.github.com/repos/{route['owner']}/{route['repo']}/releases/{release_id}",
+        "upload_url": f"https://uploads.github.com/repos/{route['owner']}/{route['repo']}/releases/{release_id}/assets{{?name,label}}",
+        "assets": [
+            {"name": name, "id": asset["asset_id"]}
+            for name, asset in assets.items() if asset.get("asset_id")
+        ]
+    }
+
+def download_asset_from_github(route, asset_url, file_name):
     """Завантажити файл-ассет з GitHub релізу."""
     try:
-        headers = {
-            "Accept": "application/octet-stream",
-            "Authorization": f"Bearer {GITHUB_TOKEN}",
-            "X-GitHub-Api-Version": "2022-11-28"
-        }
+        headers = github_headers(route, accept="application/octet-stream")
         
         # Створюємо тимчасовий файл для завантаження
         with tempfile.NamedTemporaryFile(delete=False, suffix='.zip') as temp_file:
             temp_path = temp_file.name
         
         # Завантажуємо файл
-        response = requests.get(asset_url, headers=headers, stream=True)
-        response.raise_for_status()
-        
-        with open(temp_path, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                f.write(chunk)
+        with scheduler.transfer_sync(DOWN, file_name) as transfer:
+            response = get_session().get(asset_url, headers=headers, stream=True)
+            response.raise_for_status()
+            
+            with open(temp_path, 'wb') as f:
+                for chunk in response.iter_content(chunk_size=8192):
+                    transfer.consume_sync(len(chunk))
+                    f.write(chunk)
         
         logger.info(f"Файл {file_name} успішно завантажено з GitHub")
         return temp_path
@@ -88,16 +124,16 @@ def download_asset_from_github(asset_url, file_name):
         logger.error(f"Помилка завантаження файлу {file_name} з GitHub: {e}")
         return None
 
-def download_required_files_from_previous_releases():
+def download_required_files_from_previous_releases(route):
     """Завантажити необхідні файли з попередніх релізів, шукаючи в усіх доступних релізах."""
     try:
-        all_releases = get_all_releases()
+        all_releases = get_all_releases(route)
         if not all_releases:
             logger.warning("Не знайдено жодного релізу для пошуку необхідних файлів")
             return {}
         
         downloaded_files = {}
-        remaining_files = set(REQUIRED_FILES)
+        remaining_files = set(route["required_files"])
         
         # Проходимо по всіх релізах (від найновішого до найстаршого)
         for release in all_releases:
@@ -116,14 +152,17 @@ def download_required_files_from_previous_releases():
                     
                     download_url = asset.get("browser_download_url")
                     if download_url:
-                        response = requests.get(download_url, stream=True)
-                        response.raise_for_status()
-                        
-                        # Створюємо тимчасовий файл
-                        with tempfile.NamedTemporaryFile(delete=False, suffix='.zip') as temp_file:
-                            temp_path = temp_file.name
-                            for chunk in response.iter_content(chunk_size=8192):
-                                temp_file.write(chunk)
+                        with span("history_download", file=asset_name, release=release_tag), \
+                                scheduler.transfer_sync(DOWN, asset_name) as transfer:
+                            response = get_session().get(download_url, stream=True)
+                            response.raise_for_status()
+                            
+                            # Створюємо тимчасовий файл
+                            with tempfile.NamedTemporaryFile(delete=False, suffix='.zip') as temp_file:
+                                temp_path = temp_file.name
+                                for chunk in response.iter_content(chunk_size=8192):
+                                    transfer.consume_sync(len(chunk))
+                                    temp_file.write(chunk)
                         
                         downloaded_files[asset_name] = {
                             "path": temp_path,
@@ -141,28 +180,23 @@ def download_required_files_from_previous_releases():
         logger.error(f"Помилка при завантаженні файлів з релізів: {e}")
         return {}
 
-def create_github_release(version: str, description: str, file_paths):
+def create_github_release(route, version: str, description: str, file_paths):
     """Створити реліз на GitHub і додати до нього файли."""
     # Спочатку створюємо реліз
-    release_url = f"https://api.github.com/repos/{GITHUB_OWNER}/{GITHUB_REPO}/releases"
+    release_url = f"https://api.github.com/repos/{route['owner']}/{route['repo']}/releases"
     
     # Створюємо тег для релізу
     tag = f"v{version}"
     
     # Додаємо плашку з лічильником завантажень до опису
-    download_badge = f"![GitHub release (latest by date)](https://img.shields.io/github/downloads/{GITHUB_OWNER}/{GITHUB_REPO}/{tag}/total)\n\n"
-    enhanced_description = download_badge + description
+    enhanced_description = download_badge(route, tag) + description
     
-    headers = {
-        "Accept": "application/vnd.github+json",
-        "Authorization": f"Bearer {GITHUB_TOKEN}",
-        "X-GitHub-Api-Version": "2022-11-28"
-    }
+    headers = github_headers(route)
     
     data = {
         "tag_name": tag,
         "target_commitish": "main",
-        "name": "4IFIR",  # Фіксована назва релізу
+        "name": route["release_name"],  # Фіксована назва релізу
         "body": enhanced_description,
         "draft": False,
         "prerelease": False
@@ -170,8 +204,9 @@ def create_github_release(version: str, description: str, file_paths):
     
     try:
         # Створення релізу
-        response = requests.post(release_url, headers=headers, json=data)
-        response.raise_for_status()
+        with span("create_release", tag=tag):
+            response = get_session().post(release_url, headers=headers, json=data)
+            response.raise_for_status()
         release_data = response.json()
         
         # Отримуємо URL для завантаження ассетів
@@ -185,8 +220,10 @@ def create_github_release(version: str, description: str, file_paths):
             file_path = file_info["path"]
             file_name = file_info["name"]
             
-            success = add_file_to_release(upload_url, file_path, file_name, headers)
-            if not success:
+            asset = add_file_to_release(upload_url, file_path, file_name, headers)
+            if asset:
+                file_info["asset_id"] = asset.get("id")
+            else:
                 all_uploads_successful = False
         
         if all_uploads_successful:
@@ -194,64 +231,76 @@ def create_github_release(version: str, description: str, file_paths):
         else:
             logger.warning(f"GitHub реліз v{version} створено, але деякі файли не були завантажені")
             
-        return all_uploads_successful, release_data["html_url"]
+        return all_uploads_successful, release_data
     except Exception as e:
         logger.error(f"Помилка створення GitHub релізу: {e}")
         return False, None
 
-def update_github_release_assets(release_data, file_paths, description=None):
-    """Update or replace files in an existing GitHub release."""
-    headers = {
-        "Accept": "application/vnd.github+json",
-        "Authorization": f"Bearer {GITHUB_TOKEN}",
-        "X-GitHub-Api-Version": "2022-11-28"
-    }
+def delete_release_asset(route, asset_id, file_name):
+    """Видалити ассет релізу за id. Ассет, якого вже немає (404), вважається видаленим."""
+    delete_url = f"https://api.github.com/repos/{route['owner']}/{route['repo']}/releases/assets/{asset_id}"
+    try:
+        logger.info(f"Deleting old asset {file_name} (ID: {asset_id}) from release...")
+        with span("delete_asset", file=file_name):
+            del_response = get_session().delete(delete_url, headers=github_headers(route))
+        if del_response.status_code == 404:
+            # Ассет вже видалено поза ботом
+            logger.warning(f"Old asset {file_name} (ID: {asset_id}) was already gone.")
+        else:
+            del_response.raise_for_status()
+            logger.info(f"Old asset {file_name} deleted successfully.")
+        return True
+    except Exception as e:
+        logger.error(f"Error deleting old asset {file_name} from GitHub release: {e}")
+        return False
+
+def update_github_release_assets(route, release_data, file_paths, description=None):
+    """
+    Update or replace files in an existing GitHub release.
+    release_data may come from the API or from build_release_data().
+    """
+    headers = github_headers(route)
+    
+    all_uploads_successful = True
     
     # 1. Update the release description if a new one is provided
     if description:
         try:
             tag = release_data.get("tag_name")
-            download_badge = f"![GitHub release (latest by date)](https://img.shields.io/github/downloads/{GITHUB_OWNER}/{GITHUB_REPO}/{tag}/total)\n\n"
-            enhanced_description = download_badge + description
+            enhanced_description = download_badge(route, tag) + description
             
             update_url = release_data["url"]
             data = {
                 "body": enhanced_description
             }
-            patch_response = requests.patch(update_url, headers=headers, json=data)
-            patch_response.raise_for_status()
+            with span("patch_description"):
+                patch_response = get_session().patch(update_url, headers=headers, json=data)
+                patch_response.raise_for_status()
             logger.info("Existing GitHub release description updated successfully.")
             release_data = patch_response.json()
         except Exception as e:
             logger.error(f"Error updating release description on GitHub: {e}")
+            all_uploads_successful = False
 
     # 2. Find assets that already exist and delete them before upload
     existing_assets = {asset["name"]: asset["id"] for asset in release_data.get("assets", [])}
     upload_url = release_data["upload_url"].split("{")[0]
     
-    all_uploads_successful = True
-    
     for file_info in file_paths:
         file_path = file_info["path"]
         file_name = file_info["name"]
         
         # If asset already exists, delete it first
         if file_name in existing_assets:
-            asset_id = existing_assets[file_name]
-            delete_url = f"https://api.github.com/repos/{GITHUB_OWNER}/{GITHUB_REPO}/releases/assets/{asset_id}"
-            try:
-                logger.info(f"Deleting old asset {file_name} (ID: {asset_id}) from release...")
-                del_response = requests.delete(delete_url, headers=headers)
-                del_response.raise_for_status()
-                logger.info(f"Old asset {file_name} deleted successfully.")
-            except Exception as e:
-                logger.error(f"Error deleting old asset {file_name} from GitHub release: {e}")
+            if not delete_release_asset(route, existing_assets[file_name], file_name):
                 all_uploads_successful = False
                 continue
         
         # Upload the new asset
-        success = add_file_to_release(upload_url, file_path, file_name, headers)
-        if not success:
+        asset = add_file_to_release(upload_url, file_path, file_name, headers)
+        if asset:
+            file_info["asset_id"] = asset.get("id")
+        else:
             all_uploads_successful = False
             
-    return all_uploads_successful, release_data["html_url"]
\ No newline at end of file
+    return all_uploads_successful, release_data
\ No newline at end of file
@@ -1,47 +1,102 @@
 import os
+import json
+import time
 import asyncio
 from datetime import datetime
 
 from telegram import Update
 from telegram.ext import ContextTypes
-from telegram.constants import ParseMode
+from telegram.constants import ParseMode, ChatMemberStatus
 
-from config import (
-    TELEGRAM_GROUP_ID, TELEGRAM_TOPIC_ID, 
-    TELEGRAM_LOG_CHAT_ID, REQUIRED_FILES, logger,
-    ENABLE_GITHUB_RELEASE, ENABLE_CHECKER_SCRIPT,
-    ENABLE_FILE_DOWNLOAD
-)
+import config
+from config import ROUTES, logger
 from github_api import (
     create_github_release, download_required_files_from_previous_releases,
-    get_latest_release, update_github_release_assets
+    build_release_data, update_github_release_assets, get_latest_release, delete_release_asset
 )
-from utils import run_checker_script_async, download_file
+from utils import run_checker_script_async, download_file, file_sha256, checker_cache_key
+from tracing import release_trace, span, profile_release
+from transfers import file_priority, run_blocking
+import state_store
 
 # --- ДОПОМІЖНІ ФУНКЦІЇ ---
 
-import json
+def find_route(chat_id, thread_id):
+    """
+    Знайти маршрут для повідомлення.
+    Спочатку точний збіг топіку, потім маршрут на всю групу.
+    Повідомлення без топіку потрапляють у перший маршрут групи.
+    """
+    group_routes = [route for route in ROUTES if route["group_id"] == chat_id]
+    for route in group_routes:
+        if thread_id and route["topic_id"] == thread_id:
+            return route
+    for route in group_routes:
+        if route["topic_id"] is None:
+            return route
+    if not thread_id and group_routes:
+        return group_routes[0]
+    return None
 
-LAST_MSG_ID_FILE = "last_message_id.json"
+def get_route_semaphore(context, route):
+    """
+    Окремий ліміт одночасних релізів для кожного маршруту.
+    Якщо ліміт змінили в конфігурації, створюється новий семафор; релізи,
+    що вже тримають старий, просто доробляються.
+    """
+    semaphores = context.bot_data.setdefault('route_semaphores', {})
+    limit = route["max_concurrent_releases"]
+    current = semaphores.get(route["name"])
+    if current is None or current[0] != limit:
+        current = semaphores[route["name"]] = (limit, asyncio.Semaphore(limit))
+    return current[1]
 
-def get_last_processed_message_id():
-    """Load the last processed Telegram message ID from file."""
-    try:
-        if os.path.exists(LAST_MSG_ID_FILE):
-            with open(LAST_MSG_ID_FILE, 'r') as f:
-                data = json.load(f)
-                return data.get("last_message_id")
-    except Exception as e:
-        logger.error(f"Error loading last message ID: {e}")
-    return None
+async def hash_files(files):
+    """Порахувати sha256 файлів у робочому потоці, щоб великі zip не блокували event loop."""
+    for file_info in files:
+        if "sha256" not in file_info:
+            file_info["sha256"] = await run_blocking(file_sha256, file_info["path"])
 
-def save_last_processed_message_id(message_id):
-    """Save the last processed Telegram message ID to file."""
+async def remember_release(route, message_id, release_data, documents, files, updated_names, kept_names,
+                           release_notes, previous_assets=None, notes_message_id=None):
+    """
+    Зберегти стан релізу в локальне сховище: документи повідомлень,
+    ассети (id + sha256), частини опису та повідомлення, з якого взято опис.
+    """
+    await hash_files(files)
+    assets = dict(previous_assets or {})
+    for file_info in files:
+        # Невдале завантаження не затирає відомий ассет
+        if file_info.get("asset_id") is None and file_info["name"] in assets:
+            continue
+        assets[file_info["name"]] = {
+            "asset_id": file_info.get("asset_id"),
+            "sha256": file_info["sha256"]
+        }
     try:
-        with open(LAST_MSG_ID_FILE, 'w') as f:
-            json.dump({"last_message_id": message_id}, f)
+        state_store.save_release(
+            route, message_id, release_data["id"], release_data.get("tag_name", "unknown"),
+            release_data.get("html_url"), documents, assets,
+            updated_names, kept_names, release_notes, notes_message_id
+        )
     except Exception as e:
-        logger.error(f"Error saving last message ID: {e}")
+        logger.error(f"Error saving release state for message {message_id}: {e}")
+
+def document_fingerprint(message):
+    """Identity of the document attached to a message."""
+    return {
+        "name": message.document.file_name,
+        "file_unique_id": message.document.file_unique_id,
+        "file_size": message.document.file_size
+    }
+
+def is_same_document(message, stored):
+    """Check whether the message still carries the document that was processed."""
+    current = document_fingerprint(message)
+    return (
+        current["file_unique_id"] == stored.get("file_unique_id")
+        and current["file_size"] == stored.get("file_size")
+    )
 
 def extract_release_notes(message):
     """
@@ -60,14 +115,168 @@ def extract_release_notes(message):
         
     return None
 
+def release_notes_message_id(message):
+    """ID повідомлення, з якого extract_release_notes бере опис, якщо це reply."""
+    reply = message.reply_to_message
+    if reply and (reply.text or reply.caption):
+        return reply.message_id
+    return None
+
+def build_release_description(updated_names, kept_names, release_notes):
+    """Генерація опису релізу."""
+    description_parts = []
+    
+    if updated_names:
+        description_parts.append("🆕 **Оновлено:**")
+        for name in updated_names:
+            description_parts.append(f"- `{name}`")
+    
+    if kept_names:
+        description_parts.append("\n♻️ **Без змін:**")
+        for name in kept_names:
+            description_parts.append(f"- `{name}`")
+    
+    if release_notes and len(release_notes.strip()) > 0:
+        description_parts.append(f"\n📝 **Список змін:**\n{release_notes}")
+    
+    return "\n".join(description_parts)
+
+def cleanup_files(files):
+    """Видалення тимчасових файлів."""
+    for file_info in files:
+        if os.path.exists(file_info["path"]) and "dummy" not in file_info["path"]:
+            try: os.unlink(file_info["path"])
+            except: pass
+
+async def release_asset_hashes(route, message_id, files):
+    """
+    {ім'я: sha256} усіх ассетів релізу: зі сховища, якщо реліз там є,
+    інакше з локальних файлів.
+    """
+    stored_release = state_store.get_release(route, message_id) if config.ENABLE_GITHUB_RELEASE else None
+    if stored_release:
+        return {name: asset["sha256"] for name, asset in stored_release["assets"].items()}
+    await hash_files(files)
+    return {file_info["name"]: file_info["sha256"] for file_info in files}
+
+async def run_release_checker(context: ContextTypes.DEFAULT_TYPE, route, message_id, asset_hashes,
+                              success_message=None, force=False):
+    """
+    Запуск скрипта перевірки з кешем за вмістом релізу.
+    Якщо такий самий набір ассетів уже перевірявся тим самим скриптом,
+    повертається збережений результат (force=True — перевірити заново).
+    """
+    cache_key = checker_cache_key(route, asset_hashes)
+    cached = state_store.get_checker_result(cache_key) if cache_key and not force else None
+    
+    if cached:
+        logger.info(f"Checker result for message {message_id} taken from cache (checked for message {cached['message_id']})")
+        with span("checker", cached=True):
+            check_ok = cached["ok"]
+        res_txt = "✅ Перевірка успішна" if check_ok else "⚠️ Помилка перевірки"
+        res_txt += f" (збережений результат від {cached['checked_at']} UTC, /recheck {message_id} — перевірити заново)"
+        if success_message:
+            res_txt = f"{success_message}\n\n{res_txt}"
+        await context.bot.send_message(chat_id=route["log_chat_id"], text=res_txt, parse_mode=ParseMode.MARKDOWN)
+        return check_ok
+    
+    await context.bot.send_message(
+        chat_id=route["log_chat_id"], 
+        text=(f"{success_message}\n\n" if success_message else "") + "⏳ Запускаю скрипт перевірки...",
+        parse_mode=ParseMode.MARKDOWN
+    )
+    with span("checker", cached=False) as checker_span:
+        returncode = await run_checker_script_async(route, message_id)
+        check_ok = returncode == 0
+        if not check_ok: checker_span.fail()
+    # Кешується лише вердикт скрипта, а не збій його запуску
+    if returncode is None:
+        await context.bot.send_message(chat_id=route["log_chat_id"], text="⚠️ Не вдалося запустити скрипт перевірки")
+        return False
+    if cache_key:
+        state_store.save_checker_result(route, cache_key, check_ok, message_id)
+    res_txt = "✅ Перевірка успішна" if check_ok else "⚠️ Помилка перевірки"
+    await context.bot.send_message(chat_id=route["log_chat_id"], text=res_txt)
+    return check_ok
+
+# --- СТАН ДО ПОЯВИ БАЗИ ---
+
+# Раніше бот пам'ятав лише останнє повідомлення, для якого створив реліз
+LEGACY_LAST_MSG_ID_FILE = "last_message_id.json"
+
+def parse_release_description(body):
+    """Списки "Оновлено"/"Без змін" і список змін з опису, зібраного build_release_description."""
+    updated_names, kept_names, release_notes = [], [], None
+    body = body or ""
+    if "📝 **Список змін:**\n" in body:
+        body, release_notes = body.split("📝 **Список змін:**\n", 1)
+    section = None
+    for line in body.splitlines():
+        if line.startswith("🆕"):
+            section = updated_names
+        elif line.startswith("♻️"):
+            section = kept_names
+        elif section is not None and line.startswith("- `") and line.endswith("`"):
+            section.append(line[3:-1])
+    return updated_names, kept_names, release_notes
+
+def legacy_route():
+    """Маршрут, якому належав last_message_id.json (старий конфіг мав одну групу/топік)."""
+    if len(ROUTES) == 1:
+        return ROUTES[0]
+    if config.TELEGRAM_GROUP_ID:
+        topic_id = int(config.TELEGRAM_TOPIC_ID) if config.TELEGRAM_TOPIC_ID else None
+        return find_route(int(config.TELEGRAM_GROUP_ID), topic_id)
+    return None
+
+def import_legacy_state():
+    """
+    Одноразово перенести last_message_id.json у базу стану: повідомлення
+    прив'язується до останнього релізу на GitHub, щоб його редагування,
+    як і раніше, оновлювало цей реліз, а не створювало новий.
+    """
+    if not config.ENABLE_GITHUB_RELEASE or not os.path.exists(LEGACY_LAST_MSG_ID_FILE):
+        return
+    try:
+        with open(LEGACY_LAST_MSG_ID_FILE, 'r') as f:
+            message_id = json.load(f).get("last_message_id")
+    except Exception as e:
+        logger.error(f"Error loading {LEGACY_LAST_MSG_ID_FILE}: {e}")
+        return
+    
+    route = legacy_route()
+    if message_id is None or route is None:
+        logger.warning(f"{LEGACY_LAST_MSG_ID_FILE}: не вдалося визначити повідомлення або маршрут, пропускаємо")
+        return
+    
+    if state_store.find_release_message_id(route, message_id) is None:
+        release = get_latest_release(route)
+        if not release:
+            logger.warning(f"{LEGACY_LAST_MSG_ID_FILE}: останній реліз не отримано, спробуємо при наступному запуску")
+            return
+        updated_names, kept_names, release_notes = parse_release_description(release.get("body"))
+        # Документ повідомлення невідомий: при редагуванні файли буде перезавантажено
+        state_store.save_release(
+            route, message_id, release["id"], release["tag_name"], release.get("html_url"),
+            {message_id: {"name": None, "file_unique_id": None, "file_size": None}},
+            {asset["name"]: {"asset_id": asset["id"], "sha256": None} for asset in release.get("assets", [])},
+            updated_names, kept_names, release_notes
+        )
+        logger.info(f"Повідомлення {message_id} з {LEGACY_LAST_MSG_ID_FILE} прив'язано до релізу {release['tag_name']}")
+    
+    os.replace(LEGACY_LAST_MSG_ID_FILE, LEGACY_LAST_MSG_ID_FILE + ".imported")
+
 # --- ЛОГІКА РЕЛІЗУ ---
 
-async def process_release_logic(context: ContextTypes.DEFAULT_TYPE, telegram_files, release_notes, message_id):
+async def process_release_logic(context: ContextTypes.DEFAULT_TYPE, route, telegram_files, release_notes, message_id,
+                                version=None, notes_message_id=None):
     """
     Основна логіка: перевірка файлів -> GitHub -> Checker.
+    version — для релізів з історії (час повідомлення), інакше поточний час.
+    notes_message_id — reply, з якого взято опис (його редагування оновить опис).
     """
     try:
-        version = datetime.now().strftime("%Y.%m.%d-%H.%M")
+        version = version or datetime.now().strftime("%Y.%m.%d-%H.%M")
         
         final_files_list = list(telegram_files)
         updated_names = [f["name"] for f in telegram_files]
@@ -77,13 +286,14 @@ async def process_release_logic(context: ContextTypes.DEFAULT_TYPE, telegram_fil
         
         # Перевірка на відсутні файли
         missing_required_files = []
-        for required_file in REQUIRED_FILES:
+        for required_file in route["required_files"]:
             if required_file not in files_map:
                 missing_required_files.append(required_file)
         
         # Докачування з історії
         if missing_required_files:
-            previous_files = download_required_files_from_previous_releases()
+            with span("history_fetch", files=missing_required_files):
+                previous_files = await run_blocking(download_required_files_from_previous_releases, route)
             for req_file in missing_required_files:
                 if req_file in previous_files:
                     file_info = previous_files[req_file]
@@ -91,7 +301,7 @@ async def process_release_logic(context: ContextTypes.DEFAULT_TYPE, telegram_fil
                     kept_names.append(req_file)
                 else:
                     await context.bot.send_message(
-                        chat_id=TELEGRAM_LOG_CHAT_ID,
+                        chat_id=route["log_chat_id"],
                         text=f"❌ Файл {req_file} не знайдено ніде!"
                     )
 
@@ -100,40 +310,37 @@ async def process_release_logic(context: ContextTypes.DEFAULT_TYPE, telegram_fil
             release_url = None
             
             # --- СОРТУВАННЯ ФАЙЛІВ ---
-            # 4IFIR.zip завжди перший (пріоритет 0), всі інші - за ними (пріоритет 1)
-            final_files_list.sort(key=lambda f: 0 if f['name'] == '4IFIR.zip' else 1)
+            # Файли з transfers.priority_files (4IFIR.zip) — першими, всі інші — за ними
+            final_files_list.sort(key=lambda f: file_priority(f['name']))
             
             # Генерація опису
-            description_parts = []
-            
-            if updated_names:
-                description_parts.append("🆕 **Оновлено:**")
-                for name in updated_names:
-                    description_parts.append(f"- `{name}`")
-            
-            if kept_names:
-                description_parts.append("\n♻️ **Без змін:**")
-                for name in kept_names:
-                    description_parts.append(f"- `{name}`")
+            with span("build_description"):
+                full_description = build_release_description(updated_names, kept_names, release_notes)
             
-            if release_notes and len(release_notes.strip()) > 0:
-                description_parts.append(f"\n📝 **Список змін:**\n{release_notes}")
-            
-            full_description = "\n".join(description_parts)
+            documents = {
+                f["message_id"]: f["fingerprint"]
+                for f in telegram_files if "fingerprint" in f
+            }
             
             # GitHub Release
-            if ENABLE_GITHUB_RELEASE:
-                last_msg_id = get_last_processed_message_id()
-                is_update = last_msg_id is not None and last_msg_id == message_id
-                
-                latest_release = None
-                if is_update:
-                    latest_release = get_latest_release()
+            if config.ENABLE_GITHUB_RELEASE:
+                # Реліз для цього повідомлення шукаємо локально, без запитів до GitHub
+                stored_release = state_store.get_release(route, message_id)
                 
-                if is_update and latest_release:
-                    logger.info(f"Updating assets for existing release (message_id: {message_id})")
-                    success, release_url = update_github_release_assets(latest_release, final_files_list, full_description)
-                    version_tag = latest_release.get("tag_name", "unknown")
+                if stored_release:
+                    logger.info(f"Updating assets for existing release {stored_release['release_id']} (message_id: {message_id})")
+                    release_data = build_release_data(
+                        route, stored_release["release_id"], stored_release["tag_name"],
+                        stored_release["html_url"], stored_release["assets"]
+                    )
+                    success, release_data = await run_blocking(update_github_release_assets, route, release_data, final_files_list, full_description)
+                    version_tag = stored_release["tag_name"]
+                    release_url = release_data.get("html_url")
+                    await remember_release(
+                        route, message_id, release_data, documents, final_files_list,
+                        updated_names, kept_names, release_notes, stored_release["assets"],
+                        notes_message_id or stored_release["notes_message_id"]
+                    )
                     if success:
                         success_message = (
                             f"🔄 **Реліз {version_tag} оновлено!**\n\n"
@@ -141,63 +348,88 @@ async def process_release_logic(context: ContextTypes.DEFAULT_TYPE, telegram_fil
                             f"📎 [GitHub Release]({release_url})"
                         )
                     else:
-                        await context.bot.send_message(chat_id=TELEGRAM_LOG_CHAT_ID, text="❌ Помилка оновлення файлів на GitHub.")
+                        await context.bot.send_message(chat_id=route["log_chat_id"], text="❌ Помилка оновлення файлів на GitHub.")
                         return
                 else:
                     logger.info(f"Creating new GitHub release (message_id: {message_id})")
-                    success, release_url = create_github_release(version, full_description, final_files_list)
+                    success, release_data = await run_blocking(create_github_release, route, version, full_description, final_files_list)
+                    if release_data:
+                        # Навіть частково створений реліз прив'язуємо до повідомлення
+                        await remember_release(
+                            route, message_id, release_data, documents, final_files_list,
+                            updated_names, kept_names, release_notes, notes_message_id=notes_message_id
+                        )
                     if success:
-                        save_last_processed_message_id(message_id)
+                        release_url = release_data["html_url"]
                         success_message = (
                             f"✅ **Реліз v{version} створено!**\n\n"
                             f"{full_description}\n\n"
                             f"📎 [GitHub Release]({release_url})"
                         )
                     else:
-                        await context.bot.send_message(chat_id=TELEGRAM_LOG_CHAT_ID, text="❌ Помилка GitHub API.")
+                        await context.bot.send_message(chat_id=route["log_chat_id"], text="❌ Помилка GitHub API.")
                         return
             else:
                 success_message = f"✅ Файли оброблено.\n\n{full_description}"
                 success = True
             
+            # Вміст релізу для кешу перевірки (до видалення файлів)
+            asset_hashes = await release_asset_hashes(route, message_id, final_files_list) if success else None
+            
             # Видалення файлів
-            for file_info in final_files_list:
-                if os.path.exists(file_info["path"]) and "dummy" not in file_info["path"]:
-                    try: os.unlink(file_info["path"])
-                    except: pass
+            cleanup_files(final_files_list)
 
             # Запуск скрипта перевірки
-            if success and ENABLE_CHECKER_SCRIPT:
-                await context.bot.send_message(
-                    chat_id=TELEGRAM_LOG_CHAT_ID, 
-                    text=success_message + "\n\n⏳ Запускаю скрипт перевірки...",
-                    parse_mode=ParseMode.MARKDOWN
-                )
-                check_ok = await run_checker_script_async(message_id)
-                res_txt = "✅ Перевірка успішна" if check_ok else "⚠️ Помилка перевірки"
-                await context.bot.send_message(chat_id=TELEGRAM_LOG_CHAT_ID, text=res_txt)
+            if success and config.ENABLE_CHECKER_SCRIPT:
+                await run_release_checker(context, route, message_id, asset_hashes, success_message)
             else:
-                await context.bot.send_message(chat_id=TELEGRAM_LOG_CHAT_ID, text=success_message, parse_mode=ParseMode.MARKDOWN)
+                await context.bot.send_message(chat_id=route["log_chat_id"], text=success_message, parse_mode=ParseMode.MARKDOWN)
         else:
-            await context.bot.send_message(chat_id=TELEGRAM_LOG_CHAT_ID, text="ℹ️ Немає файлів.")
+            await context.bot.send_message(chat_id=route["log_chat_id"], text="ℹ️ Немає файлів.")
 
     except Exception as e:
         logger.error(f"Logic Error: {e}")
-        await context.bot.send_message(chat_id=TELEGRAM_LOG_CHAT_ID, text=f"❌ Error: {e}")
+        await context.bot.send_message(chat_id=route["log_chat_id"], text=f"❌ Error: {e}")
 
 # --- БУФЕРИЗАЦІЯ ТА ОБРОБКА ---
 
-async def process_buffered_files(context: ContextTypes.DEFAULT_TYPE, group_id: str):
+async def download_messages(context: ContextTypes.DEFAULT_TYPE, route, messages):
+    """
+    Завантажити документи повідомлень одночасно. Порядок і смугу
+    визначає планувальник передач (пріоритетні файли — першими).
+    Результат — у порядку повідомлень.
+    """
+    async def download_one(msg):
+        file_name = msg.document.file_name
+        try:
+            with span("download", file=file_name, size=msg.document.file_size) as download_span:
+                file_info = await download_file(context.bot, msg, file_name)
+                if not file_info: download_span.fail()
+            if file_info:
+                file_info["message_id"] = msg.message_id
+                file_info["fingerprint"] = document_fingerprint(msg)
+                return file_info
+        except Exception as e:
+            logger.error(f"Download failed {file_name}: {e}")
+        await context.bot.send_message(chat_id=route["log_chat_id"], text=f"⚠️ Помилка завантаження: {file_name}")
+        return None
+
+    # Задачі створюються за пріоритетом файлів, щоб вільні слоти першими
+    # отримали пріоритетні файли, а не перші за порядком у групі
+    tasks = {
+        msg.message_id: asyncio.create_task(download_one(msg))
+        for msg in sorted(messages, key=lambda m: file_priority(m.document.file_name))
+    }
+    results = await asyncio.gather(*(tasks[msg.message_id] for msg in messages))
+    return [file_info for file_info in results if file_info]
+
+async def process_buffered_files(context: ContextTypes.DEFAULT_TYPE, group_data):
     """
     Виконується, коли таймер очікування (4 с) сплив.
     Завантажує файли та запускає реліз.
     """
-    if 'media_groups_buffer' not in context.bot_data: return
-    if group_id not in context.bot_data['media_groups_buffer']: return
-    
-    group_data = context.bot_data['media_groups_buffer'][group_id]
+    route = group_data['route']
     messages = group_data['messages']
-    del context.bot_data['media_groups_buffer'][group_id] # Очищаємо буфер
     
     # Визначаємо основний меседж (перший)
     first_msg = messages[0]
@@ -207,37 +439,209 @@ async def process_buffered_files(context: ContextTypes.DEFAULT_TYPE, group_id: s
     # Лог
     count_str = f"{len(messages)} файлів" if len(messages) > 1 else "1 файл"
     await context.bot.send_message(
-        chat_id=TELEGRAM_LOG_CHAT_ID,
+        chat_id=route["log_chat_id"],
         text=f"📥 Отримано {count_str}. Починаю завантаження..."
     )
     
-    downloaded_files = []
-    
     # Завантажуємо
-    for msg in messages:
-        file_name = msg.document.file_name
-        try:
-            file_info = await download_file(context.bot, msg, file_name)
-            if file_info:
-                downloaded_files.append(file_info)
-        except Exception as e:
-            logger.error(f"Download failed {file_name}: {e}")
-            await context.bot.send_message(chat_id=TELEGRAM_LOG_CHAT_ID, text=f"⚠️ Помилка завантаження: {file_name}")
+    downloaded_files = await download_messages(context, route, messages)
 
     if downloaded_files:
-        await process_release_logic(context, downloaded_files, release_notes, main_msg_id)
+        with profile_release(route, main_msg_id):
+            await process_release_logic(
+                context, route, downloaded_files, release_notes, main_msg_id,
+                notes_message_id=release_notes_message_id(first_msg)
+            )
     else:
-        await context.bot.send_message(chat_id=TELEGRAM_LOG_CHAT_ID, text="❌ Жоден файл не завантажився.")
+        await context.bot.send_message(chat_id=route["log_chat_id"], text="❌ Жоден файл не завантажився.")
+
+async def process_buffered_edits(context: ContextTypes.DEFAULT_TYPE, group_data):
+    """
+    Обробка редагувань вже опублікованого релізу.
+    Якщо змінено лише підпис/reply — один PATCH опису релізу.
+    Якщо замінено документи — перезавантажуються лише вони.
+    Серед повідомлень може бути відредагований текст reply без документа.
+    """
+    route = group_data['route']
+    messages = group_data['messages']
+    main_msg_id = group_data['release_message_id']
+    
+    try:
+        record = state_store.get_release(route, main_msg_id)
+        if not record:
+            return
+        
+        # Останнє редагування кожного повідомлення — актуальне
+        latest_edits = {msg.message_id: msg for msg in messages}
+        documents = record["documents"]
+        
+        changed_messages = [
+            msg for msg_id, msg in latest_edits.items()
+            if msg.document and not is_same_document(msg, documents.get(msg_id, {}))
+        ]
+        
+        # Опис береться з reply або основного повідомлення, як і при створенні релізу
+        release_notes = record.get("notes")
+        notes_msg_id = record.get("notes_message_id")
+        if notes_msg_id in latest_edits:
+            notes_msg = latest_edits[notes_msg_id]
+            release_notes = notes_msg.text or notes_msg.caption
+        elif main_msg_id in latest_edits:
+            release_notes = extract_release_notes(latest_edits[main_msg_id])
+        
+        if not changed_messages and release_notes == record.get("notes"):
+            logger.info(f"Edit of message {main_msg_id} changes nothing in the release, skipping.")
+            return
+        
+        if not config.ENABLE_GITHUB_RELEASE:
+            return
+        
+        # Реліз відомий локально — діємо напряму за його id
+        release_data = build_release_data(
+            route, record["release_id"], record["tag_name"], record["html_url"], record["assets"]
+        )
+        version_tag = record["tag_name"]
+        
+        # Завантажуємо лише замінені документи
+        downloaded_files = await download_messages(context, route, changed_messages)
+        
+        if changed_messages and not downloaded_files:
+            await context.bot.send_message(chat_id=route["log_chat_id"], text="❌ Жоден файл не завантажився.")
+            return
+        
+        # Документ замінено файлом з іншою назвою: старий ассет треба прибрати
+        renamed = {
+            f["message_id"]: documents[f["message_id"]]["name"]
+            for f in downloaded_files
+            if documents.get(f["message_id"], {}).get("name") not in (None, f["name"])
+        }
+        stale_names = set(renamed.values())
+        
+        new_names = [f["name"] for f in downloaded_files]
+        updated_names = [name for name in record.get("updated", []) if name not in stale_names]
+        updated_names += [name for name in new_names if name not in updated_names]
+        kept_names = [name for name in record.get("kept", []) if name not in new_names and name not in stale_names]
+        full_description = build_release_description(updated_names, kept_names, release_notes)
+        
+        if downloaded_files:
+            logger.info(f"Re-uploading {len(downloaded_files)} replaced file(s) for message {main_msg_id}")
+        else:
+            logger.info(f"Caption-only edit of message {main_msg_id}, patching release description")
+        success, release_data = await run_blocking(update_github_release_assets, route, release_data, downloaded_files, full_description)
+        release_url = release_data.get("html_url")
+        
+        assets = dict(record["assets"])
+        for f in downloaded_files:
+            if f.get("asset_id") is None:
+                continue
+            documents[f["message_id"]] = f["fingerprint"]
+            # Старий ассет видаляємо лише після успішного завантаження нового
+            old_name = renamed.get(f["message_id"])
+            if old_name is None:
+                continue
+            old_asset_id = assets.get(old_name, {}).get("asset_id")
+            if old_asset_id is not None and not await run_blocking(delete_release_asset, route, old_asset_id, old_name):
+                success = False
+                continue
+            assets.pop(old_name, None)
+        await remember_release(
+            route, main_msg_id, release_data, documents, downloaded_files,
+            updated_names, kept_names, release_notes, assets, notes_msg_id
+        )
+        cleanup_files(downloaded_files)
+        
+        if not success:
+            await context.bot.send_message(chat_id=route["log_chat_id"], text="❌ Помилка оновлення релізу на GitHub.")
+            return
+        
+        if not downloaded_files:
+            await context.bot.send_message(
+                chat_id=route["log_chat_id"],
+                text=f"📝 **Опис релізу {version_tag} оновлено!**\n\n📎 [GitHub Release]({release_url})",
+                parse_mode=ParseMode.MARKDOWN
+            )
+            return
+        
+        success_message = (
+            f"🔄 **Реліз {version_tag} оновлено!**\n\n"
+            f"{full_description}\n\n"
+            f"📎 [GitHub Release]({release_url})"
+        )
+        if config.ENABLE_CHECKER_SCRIPT:
+            asset_hashes = await release_asset_hashes(route, main_msg_id, [])
+            await run_release_checker(context, route, main_msg_id, asset_hashes, success_message)
+        else:
+            await context.bot.send_message(chat_id=route["log_chat_id"], text=success_message, parse_mode=ParseMode.MARKDOWN)
+    
+    except Exception as e:
+        logger.error(f"Edit Logic Error: {e}")
+        await context.bot.send_message(chat_id=route["log_chat_id"], text=f"❌ Error: {e}")
+
+def find_group_release(route, messages):
+    """Основний message_id релізу, до якого вже належить хоч одне повідомлення групи."""
+    for msg in messages:
+        release_msg_id = state_store.find_release_message_id(route, msg.message_id)
+        if release_msg_id is not None:
+            return release_msg_id
+    return None
 
 async def _wait_and_process(context, group_id):
     """Таймер очікування завершення групи."""
     try:
         await asyncio.sleep(4) 
-        await process_buffered_files(context, group_id)
     except asyncio.CancelledError:
-        pass 
+        return
+    
+    # Забираємо групу з буфера до очікування черги маршруту,
+    # щоб нові повідомлення не скасували вже сформований реліз
+    group_data = context.bot_data.get('media_groups_buffer', {}).pop(group_id, None)
+    if not group_data: return
+    
+    route = group_data['route']
+    messages = group_data['messages']
+    is_edit = bool(group_data['release_message_id'])
+    main_msg_id = group_data['release_message_id'] or messages[0].message_id
+    
+    # Повідомлення групи позначаються як такі, що обробляються: редагування,
+    # яке прийшло під час обробки, чекає, поки реліз буде створено й збережено
+    in_progress = context.bot_data.setdefault('messages_in_progress', {})
+    keys = [(route["name"], msg.message_id) for msg in messages]
+    previous = list({id(event): event for event in (in_progress.get(key) for key in keys) if event}.values())
+    done = asyncio.Event()
+    for key in keys:
+        in_progress[key] = done
+    
+    try:
+        # Trace релізу: від першого повідомлення в буфері до завершення обробки
+        with release_trace(route, main_msg_id, "edit" if is_edit else "release", start=group_data['buffered_at']) as trace:
+            trace.add_span("buffer_wait", group_data['buffered_at'], time.perf_counter(), messages=len(messages))
+            semaphore = get_route_semaphore(context, route)
+            with span("queue_wait"):
+                for event in previous:
+                    await event.wait()
+                await semaphore.acquire()
+            try:
+                # Реліз міг з'явитися, поки група чекала (редагування щойно опублікованого)
+                if not is_edit:
+                    release_msg_id = find_group_release(route, messages)
+                    if release_msg_id is not None:
+                        group_data['release_message_id'] = release_msg_id
+                        trace.message_id = release_msg_id
+                        trace.kind = trace.root.name = "edit"
+                        is_edit = True
+                if is_edit:
+                    await process_buffered_edits(context, group_data)
+                else:
+                    await process_buffered_files(context, group_data)
+            finally:
+                semaphore.release()
+    finally:
+        done.set()
+        for key in keys:
+            if in_progress.get(key) is done:
+                del in_progress[key]
 
-async def buffer_document(update: Update, context: ContextTypes.DEFAULT_TYPE, group_id: str):
+async def buffer_document(update: Update, context: ContextTypes.DEFAULT_TYPE, route, group_id: str, release_message_id=None):
     """
     Додає файл у буфер. Якщо таймер існує — скидає його.
     """
@@ -251,11 +655,21 @@ async def buffer_document(update: Update, context: ContextTypes.DEFAULT_TYPE, gr
     if group_id not in buffer:
         buffer[group_id] = {
             'messages': [],
-            'timer_task': None
+            'timer_task': None,
+            'route': route,
+            'release_message_id': release_message_id,
+            'buffered_at': time.perf_counter()
         }
         logger.info(f"🆕 Старт буферизації: {group_id}")
     
-    buffer[group_id]['messages'].append(message)
+    # Редагування ще не обробленого повідомлення замінює його, а не дублює
+    messages = buffer[group_id]['messages']
+    for index, buffered in enumerate(messages):
+        if buffered.message_id == message.message_id:
+            messages[index] = message
+            break
+    else:
+        messages.append(message)
 
     # Перезапуск таймера (Debounce)
     if buffer[group_id]['timer_task']:
@@ -275,21 +689,98 @@ async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     message = update.effective_message
     
-    # 1. Перевірки чату
-    if message.chat.id != int(TELEGRAM_GROUP_ID): return
-    if message.message_thread_id and message.message_thread_id != int(TELEGRAM_TOPIC_ID): return
+    # 1. Пошук маршруту за чатом і топіком
+    route = find_route(message.chat.id, message.message_thread_id)
+    if not route: return
     
     # 2. Перевірка файлу
     if not message.document: return
     file_name = message.document.file_name
     if not file_name or not file_name.lower().endswith('.zip'): return
 
-    # 3. Визначення ID групи
+    # 3. Редагування вже опублікованого релізу
+    if update.edited_message:
+        release_msg_id = state_store.find_release_message_id(route, message.message_id)
+        if release_msg_id is not None:
+            await buffer_document(update, context, route, f"{route['name']}:edit_{release_msg_id}", release_msg_id)
+            return
+
+    # 4. Визначення ID групи
+    # Префікс маршруту, щоб ID з різних чатів не перетиналися
     if message.media_group_id:
-        group_id = message.media_group_id
+        group_id = f"{route['name']}:{message.media_group_id}"
     else:
         # Префікс 'single_' щоб не перетиналося з реальними ID
-        group_id = f"single_{message.message_id}"
+        group_id = f"{route['name']}:single_{message.message_id}"
+    
+    # 5. Відправка в буфер
+    await buffer_document(update, context, route, group_id)
+
+async def handle_notes_edit(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Редагування тексту, на який відповіли файлами релізу (звідки взято опис).
+    Проходить тим самим буфером редагувань, тож результат — один PATCH опису.
+    """
+    message = update.effective_message
+    if not (message.text or message.caption): return
+    
+    route = find_route(message.chat.id, message.message_thread_id)
+    if not route: return
+    
+    for release_msg_id in state_store.find_releases_by_notes_message(route, message.message_id):
+        await buffer_document(update, context, route, f"{route['name']}:edit_{release_msg_id}", release_msg_id)
+
+async def is_chat_admin(context: ContextTypes.DEFAULT_TYPE, chat_id, user_id):
+    """Чи є користувач адміністратором чату."""
+    try:
+        member = await context.bot.get_chat_member(chat_id, user_id)
+    except Exception as e:
+        logger.error(f"Error checking admin rights of {user_id} in {chat_id}: {e}")
+        return False
+    return member.status in (ChatMemberStatus.ADMINISTRATOR, ChatMemberStatus.OWNER)
+
+async def handle_recheck(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    /recheck <message_id> [маршрут]
+    Примусово перезапускає скрипт перевірки для релізу, ігноруючи кеш.
+    Приймається лише з лог-чату маршруту або від адміністраторів його групи;
+    запуск іде в черзі релізів маршруту.
+    """
+    message = update.effective_message
+    user = update.effective_user
+    chat_id = message.chat.id
+    
+    # Чужі чати й звичайних учасників ігноруємо мовчки
+    log_chats = {int(r["log_chat_id"]) for r in ROUTES}
+    group_chats = {r["group_id"] for r in ROUTES}
+    if chat_id not in log_chats:
+        if chat_id not in group_chats or not user or not await is_chat_admin(context, chat_id, user.id):
+            return
+    
+    args = context.args or []
+    if not args or not args[0].isdigit():
+        await message.reply_text("Використання: /recheck <message_id> [маршрут]")
+        return
+    message_id = int(args[0])
+    
+    if len(args) > 1:
+        route = next((r for r in ROUTES if r["name"] == args[1]), None)
+    else:
+        route = find_route(chat_id, message.message_thread_id)
+        if not route:
+            route = next((r for r in ROUTES if int(r["log_chat_id"]) == chat_id), None)
+    if not route or chat_id not in (route["group_id"], int(route["log_chat_id"])):
+        await message.reply_text("❌ Маршрут не знайдено.")
+        return
+    
+    if not config.ENABLE_CHECKER_SCRIPT:
+        await message.reply_text("ℹ️ Скрипт перевірки вимкнено.")
+        return
+    
+    await message.reply_text(f"⏳ Перевірку релізу {message_id} поставлено в чергу маршруту {route['name']}.")
     
-    # 4. Відправка в буфер
-    await buffer_document(update, context, group_id)
\ No newline at end of file
+    # Не більше перевірок одночасно, ніж релізів маршруту.
+    # Обробник зареєстровано з block=False, тож інші оновлення не чекають на нього
+    async with get_route_semaphore(context, route):
+        asset_hashes = await release_asset_hashes(route, message_id, [])
+        await run_release_checker(context, route, message_id, asset_hashes, force=True)
@@ -1,13 +1,119 @@
-from telegram.ext import Application, MessageHandler, filters
+import os
+import time
+import signal
+import argparse
+import asyncio
 import logging
+from contextlib import contextmanager
 
-from config import TELEGRAM_TOKEN, TELEGRAM_TOPIC_ID, logger
-from handlers import handle_document
+# Тривалість етапів запуску (мс), у порядку виконання
+STARTUP_PHASES = []
+
+@contextmanager
+def startup_phase(name):
+    """Заміряти етап запуску."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STARTUP_PHASES.append((name, (time.perf_counter() - started) * 1000))
+
+def log_startup_phases(logger):
+    total = sum(duration for _, duration in STARTUP_PHASES)
+    phases = ", ".join(f"{name} {duration:.0f} мс" for name, duration in STARTUP_PHASES)
+    logger.info(f"Запуск зайняв {total:.0f} мс: {phases}")
+
+# --- ПЕРЕЧИТУВАННЯ КОНФІГУРАЦІЇ ---
+
+_config_mtime = None
+
+def config_mtime():
+    import config
+    try:
+        return os.stat(config.CONFIG_PATH).st_mtime
+    except OSError:
+        return None
+
+def reload_settings():
+    """Перечитати конфігурацію (SIGHUP або зміна файлу)."""
+    global _config_mtime
+    import config
+    _config_mtime = config_mtime()
+    config.reload_config()
+
+async def watch_config():
+    """Перечитувати конфігурацію, коли змінюється файл (якщо enable_config_watch)."""
+    import config
+    global _config_mtime
+    _config_mtime = config_mtime()
+    while True:
+        await asyncio.sleep(config.CONFIG_WATCH_INTERVAL_SEC)
+        if config.ENABLE_CONFIG_WATCH and config_mtime() != _config_mtime:
+            reload_settings()
+
+async def post_init(application):
+    """Налаштування, які потребують запущеного event loop."""
+    import config
+    from tracing import enable_slow_callback_detection
+
+    enable_slow_callback_detection()
+    # Профілювання можна увімкнути/вимкнути без перезапуску
+    config.on_reload(enable_slow_callback_detection)
+
+    loop = asyncio.get_running_loop()
+    if hasattr(signal, "SIGHUP"):
+        loop.add_signal_handler(signal.SIGHUP, reload_settings)
+    application.create_task(watch_config())
+
+def parse_args():
+    """Аргументи командного рядка: без команди запускається бот."""
+    parser = argparse.ArgumentParser(description="4ifir Release Bot")
+    subparsers = parser.add_subparsers(dest="command")
+    
+    backfill_parser = subparsers.add_parser(
+        "backfill", help="Обробити історію топіку, пропущену, поки бот не працював"
+    )
+    backfill_parser.add_argument("--from-message", type=int, required=True, help="ID повідомлення, з якого почати")
+    backfill_parser.add_argument("--route", help="Назва маршруту (обов'язково, якщо їх кілька)")
+    backfill_parser.add_argument("--dry-run", action="store_true", help="Лише показати, які релізи буде створено")
+    backfill_parser.add_argument("--limit", type=int, help="Максимальна кількість повідомлень історії")
+    
+    return parser.parse_args()
 
 def main():
     """Запуск бота."""
-    # Створюємо додаток
-    application = Application.builder().token(TELEGRAM_TOKEN).build()
+    args = parse_args()
+    
+    # Конфігурація перевіряється повністю; при помилках процес завершується з їх переліком
+    with startup_phase("config"):
+        from config import TELEGRAM_TOKEN, ROUTES, logger
+    
+    if args.command == "backfill":
+        from backfill import run_backfill
+        asyncio.run(run_backfill(
+            args.route, args.from_message,
+            dry_run=args.dry_run, limit=args.limit
+        ))
+        return
+    
+    # Важкі залежності (Telethon, requests) завантажуються лише при першому використанні
+    with startup_phase("imports"):
+        from telegram.ext import Application, CommandHandler, MessageHandler, filters
+        from handlers import handle_document, handle_notes_edit, handle_recheck, import_legacy_state
+    
+    # Відкриваємо базу стану одразу, щоб помилки шляху чи міграції були видні на старті
+    with startup_phase("state_store"):
+        import state_store
+        state_store.get_connection()
+        import_legacy_state()
+    
+    with startup_phase("application"):
+        # Створюємо додаток
+        application = Application.builder().token(TELEGRAM_TOKEN).post_init(post_init).build()
+    
+    # Примусовий перезапуск скрипта перевірки (в обхід кешу)
+    # block=False: перевірка триває хвилинами й не повинна затримувати інші оновлення
+    application.add_handler(CommandHandler("recheck", handle_recheck, block=False))
     
     # Add handlers for documents
     # Add filter for messages with required message_thread_id
@@ -54,7 +160,24 @@ def main():
         )
     )
     
-    logger.info(f"Бот запущено. Очікуємо повідомлення в топіку ID: {TELEGRAM_TOPIC_ID}...")
+    # Редагування тексту, на який відповіли файлами (опис релізу)
+    application.add_handler(
+        MessageHandler(
+            filters.UpdateType.EDITED_MESSAGE &
+            (filters.TEXT | filters.CAPTION) &
+            ~filters.COMMAND &
+            filters.ChatType.SUPERGROUP,
+            handle_notes_edit
+        )
+    )
+    
+    for route in ROUTES:
+        logger.info(
+            f"Маршрут {route['name']}: група {route['group_id']}, топік {route['topic_id']} "
+            f"-> {route['owner']}/{route['repo']}"
+        )
+    log_startup_phases(logger)
+    logger.info(f"Бот запущено. Очікуємо повідомлення для {len(ROUTES)} маршрут(ів)...")
     
     # Запускаємо бота без використання asyncio.run
     application.run_polling()
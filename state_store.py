@@ -0,0 +1,213 @@
+import os
+import json
+import sqlite3
+import threading
+
+from config import STATE_DB_PATH, logger
+
+# Єдине з'єднання з базою стану (SQLite у режимі WAL)
+_connection = None
+_lock = threading.Lock()
+
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS releases (
+    route TEXT NOT NULL,
+    message_id INTEGER NOT NULL,
+    release_id INTEGER NOT NULL,
+    tag_name TEXT NOT NULL,
+    html_url TEXT,
+    updated TEXT NOT NULL DEFAULT '[]',
+    kept TEXT NOT NULL DEFAULT '[]',
+    notes TEXT,
+    notes_message_id INTEGER,
+    PRIMARY KEY (route, message_id)
+);
+CREATE TABLE IF NOT EXISTS documents (
+    route TEXT NOT NULL,
+    message_id INTEGER NOT NULL,
+    release_message_id INTEGER NOT NULL,
+    name TEXT,
+    file_unique_id TEXT,
+    file_size INTEGER,
+    PRIMARY KEY (route, message_id),
+    FOREIGN KEY (route, release_message_id) REFERENCES releases(route, message_id) ON DELETE CASCADE
+);
+CREATE TABLE IF NOT EXISTS assets (
+    route TEXT NOT NULL,
+    release_message_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    asset_id INTEGER,
+    sha256 TEXT,
+    PRIMARY KEY (route, release_message_id, name),
+    FOREIGN KEY (route, release_message_id) REFERENCES releases(route, message_id) ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS documents_release_idx ON documents(route, release_message_id);
+CREATE INDEX IF NOT EXISTS releases_notes_idx ON releases(route, notes_message_id);
+CREATE TABLE IF NOT EXISTS checker_runs (
+    cache_key TEXT PRIMARY KEY,
+    route TEXT NOT NULL,
+    message_id INTEGER,
+    ok INTEGER NOT NULL,
+    checked_at TEXT NOT NULL DEFAULT (datetime('now'))
+);
+"""
+
+def get_connection():
+    """Get or create the connection to the state database."""
+    global _connection
+
+    if _connection is None:
+        db_dir = os.path.dirname(os.path.abspath(STATE_DB_PATH))
+        os.makedirs(db_dir, exist_ok=True)
+        _connection = sqlite3.connect(STATE_DB_PATH, check_same_thread=False, isolation_level=None)
+        _connection.row_factory = sqlite3.Row
+        _connection.execute("PRAGMA journal_mode=WAL")
+        _connection.execute("PRAGMA synchronous=NORMAL")
+        migrate(_connection)
+        _connection.execute("PRAGMA foreign_keys=ON")
+        logger.info(f"State store opened: {STATE_DB_PATH}")
+
+    return _connection
+
+def migrate(conn):
+    """Створити або оновити схему бази до SCHEMA_VERSION."""
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version >= SCHEMA_VERSION:
+        return
+    conn.executescript(f"BEGIN;\n{SCHEMA}\nPRAGMA user_version = {SCHEMA_VERSION};\nCOMMIT;")
+    logger.info(f"State store schema migrated from version {version} to {SCHEMA_VERSION}")
+
+def get_release(route, message_id):
+    """
+    Повертає збережений стан релізу маршруту для основного message_id або None.
+    Містить id/тег релізу, документи повідомлень і ассети з хешами.
+    """
+    with _lock:
+        conn = get_connection()
+        row = conn.execute(
+            "SELECT * FROM releases WHERE route = ? AND message_id = ?", (route["name"], message_id)
+        ).fetchone()
+        if row is None:
+            return None
+
+        documents = {
+            doc["message_id"]: {
+                "name": doc["name"],
+                "file_unique_id": doc["file_unique_id"],
+                "file_size": doc["file_size"]
+            }
+            for doc in conn.execute(
+                "SELECT * FROM documents WHERE route = ? AND release_message_id = ?", (route["name"], message_id)
+            )
+        }
+        assets = {
+            asset["name"]: {"asset_id": asset["asset_id"], "sha256": asset["sha256"]}
+            for asset in conn.execute(
+                "SELECT * FROM assets WHERE route = ? AND release_message_id = ?", (route["name"], message_id)
+            )
+        }
+
+    return {
+        "message_id": row["message_id"],
+        "release_id": row["release_id"],
+        "tag_name": row["tag_name"],
+        "html_url": row["html_url"],
+        "updated": json.loads(row["updated"]),
+        "kept": json.loads(row["kept"]),
+        "notes": row["notes"],
+        "notes_message_id": row["notes_message_id"],
+        "documents": documents,
+        "assets": assets
+    }
+
+def find_release_message_id(route, message_id):
+    """Return the main message_id of the release a Telegram message belongs to."""
+    with _lock:
+        row = get_connection().execute(
+            "SELECT release_message_id FROM documents WHERE route = ? AND message_id = ?",
+            (route["name"], message_id)
+        ).fetchone()
+    return row["release_message_id"] if row else None
+
+def find_releases_by_notes_message(route, message_id):
+    """Основні message_id релізів, опис яких узято з тексту цього повідомлення."""
+    with _lock:
+        rows = get_connection().execute(
+            "SELECT message_id FROM releases WHERE route = ? AND notes_message_id = ?",
+            (route["name"], message_id)
+        ).fetchall()
+    return [row["message_id"] for row in rows]
+
+def save_release(route, message_id, release_id, tag_name, html_url, documents, assets,
+                 updated_names, kept_names, release_notes, notes_message_id=None):
+    """
+    Атомарно зберегти повний стан релізу.
+    notes_message_id — повідомлення (reply), з тексту якого взято опис.
+    documents: {message_id: {"name", "file_unique_id", "file_size"}}
+    assets: {name: {"asset_id", "sha256"}}
+    """
+    with _lock:
+        conn = get_connection()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            route_name = route["name"]
+            conn.execute(
+                "INSERT INTO releases (route, message_id, release_id, tag_name, html_url, updated, kept, notes, notes_message_id) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(route, message_id) DO UPDATE SET release_id = excluded.release_id, "
+                "tag_name = excluded.tag_name, html_url = excluded.html_url, "
+                "updated = excluded.updated, kept = excluded.kept, notes = excluded.notes, "
+                "notes_message_id = excluded.notes_message_id",
+                (route_name, message_id, release_id, tag_name, html_url,
+                 json.dumps(updated_names), json.dumps(kept_names), release_notes, notes_message_id)
+            )
+            conn.execute(
+                "DELETE FROM documents WHERE route = ? AND release_message_id = ?", (route_name, message_id)
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO documents (route, message_id, release_message_id, name, file_unique_id, file_size) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (route_name, int(doc_msg_id), message_id, doc["name"], doc.get("file_unique_id"), doc.get("file_size"))
+                    for doc_msg_id, doc in documents.items()
+                ]
+            )
+            conn.execute(
+                "DELETE FROM assets WHERE route = ? AND release_message_id = ?", (route_name, message_id)
+            )
+            conn.executemany(
+                "INSERT INTO assets (route, release_message_id, name, asset_id, sha256) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (route_name, message_id, name, asset.get("asset_id"), asset.get("sha256"))
+                    for name, asset in assets.items()
+                ]
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+def get_checker_result(cache_key):
+    """Збережений результат скрипта перевірки для вмісту релізу або None."""
+    with _lock:
+        row = get_connection().execute(
+            "SELECT * FROM checker_runs WHERE cache_key = ?", (cache_key,)
+        ).fetchone()
+    if row is None:
+        return None
+    return {
+        "ok": bool(row["ok"]),
+        "message_id": row["message_id"],
+        "checked_at": row["checked_at"]
+    }
+
+def save_checker_result(route, cache_key, ok, message_id):
+    """Запам'ятати результат скрипта перевірки для вмісту релізу."""
+    with _lock:
+        get_connection().execute(
+            "INSERT OR REPLACE INTO checker_runs (cache_key, route, message_id, ok, checked_at) "
+            "VALUES (?, ?, ?, ?, datetime('now'))",
+            (cache_key, route["name"], message_id, int(ok))
+        )
@@ -0,0 +1,219 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+import config
+from config import logger, TRACE_FILE_PATH, PROFILE_DIR
+
+# Поточний trace і span релізу (окремі для кожної asyncio-задачі)
+_current_trace = ContextVar("release_trace", default=None)
+_current_span = ContextVar("release_span", default=None)
+_write_lock = threading.Lock()
+
+class Span:
+    """Один вкладений відрізок часу в trace релізу."""
+
+    def __init__(self, name, attrs=None, start=None):
+        self.name = name
+        self.attrs = dict(attrs or {})
+        self.start = start if start is not None else time.perf_counter()
+        self.end = None
+        self.status = "ok"
+        self.children = []
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def fail(self, error=None):
+        self.status = "error"
+        if error is not None:
+            self.attrs["error"] = str(error)
+
+    def finish(self, end=None):
+        if self.end is None:
+            self.end = end if end is not None else time.perf_counter()
+
+    def to_dict(self, origin):
+        end = self.end if self.end is not None else time.perf_counter()
+        data = {
+            "name": self.name,
+            "start_ms": round((self.start - origin) * 1000, 3),
+            "duration_ms": round((end - self.start) * 1000, 3),
+            "status": self.status
+        }
+        if self.attrs:
+            data["attrs"] = self.attrs
+        if self.children:
+            data["spans"] = [child.to_dict(origin) for child in self.children]
+        return data
+
+class ReleaseTrace:
+    """Trace одного релізу, ключ — основний message_id."""
+
+    def __init__(self, route, message_id, kind, start=None):
+        self.route = route
+        self.message_id = message_id
+        self.kind = kind
+        self.root = Span(kind, start=start)
+        self.started_at = time.time() - (time.perf_counter() - self.root.start)
+
+    def add_span(self, name, start, end, **attrs):
+        """Додати span, виміряний заздалегідь (наприклад, очікування в буфері)."""
+        span = Span(name, attrs, start=start)
+        span.finish(end)
+        self.root.children.append(span)
+        return span
+
+    def to_dict(self):
+        data = {
+            "route": self.route["name"],
+            "message_id": self.message_id,
+            "kind": self.kind,
+            "started_at": datetime.fromtimestamp(self.started_at, timezone.utc).isoformat()
+        }
+        data.update(self.root.to_dict(self.root.start))
+        return data
+
+    def write(self):
+        """Дописати trace одним рядком у JSONL-файл."""
+        try:
+            line = json.dumps(self.to_dict(), ensure_ascii=False)
+            with _write_lock:
+                with open(TRACE_FILE_PATH, 'a', encoding='utf-8') as f:
+                    f.write(line + "\n")
+        except Exception as e:
+            logger.error(f"Error writing release trace for message {self.message_id}: {e}")
+
+@contextmanager
+def release_trace(route, message_id, kind="release", start=None):
+    """Відкрити trace релізу. Після завершення він записується в TRACE_FILE_PATH."""
+    trace = ReleaseTrace(route, message_id, kind, start)
+    trace_token = _current_trace.set(trace)
+    span_token = _current_span.set(trace.root)
+    try:
+        yield trace
+    except BaseException as e:
+        trace.root.fail(repr(e))
+        raise
+    finally:
+        trace.root.finish()
+        _current_span.reset(span_token)
+        _current_trace.reset(trace_token)
+        if config.ENABLE_RELEASE_TRACING:
+            trace.write()
+
+@contextmanager
+def span(name, **attrs):
+    """
+    Вкладений span у поточному trace.
+    Поза trace повертає span, який нікуди не записується.
+    """
+    parent = _current_span.get()
+    if parent is None:
+        yield Span(name, attrs)
+        return
+
+    current = Span(name, attrs)
+    parent.children.append(current)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.fail(repr(e))
+        raise
+    finally:
+        current.finish()
+        _current_span.reset(token)
+
+def current_trace():
+    """Поточний trace релізу або None."""
+    return _current_trace.get()
+
+# --- ПРОФІЛЮВАННЯ ---
+
+class SamplingProfiler:
+    """
+    Простий семплюючий профайлер: окремий потік періодично знімає стек
+    потоку event loop і рахує згорнуті стеки (формат flamegraph.pl / speedscope).
+    """
+
+    def __init__(self, interval_ms=None):
+        self.interval = (interval_ms or config.PROFILE_SAMPLE_INTERVAL_MS) / 1000
+        self.samples = Counter()
+        self._target = threading.get_ident()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="release-profiler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def write(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+@contextmanager
+def profile_release(route, message_id):
+    """Семплювати event loop на час обробки релізу, якщо профілювання увімкнено."""
+    if not config.ENABLE_PROFILING:
+        yield None
+        return
+
+    profiler = SamplingProfiler()
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        try:
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+            path = os.path.join(PROFILE_DIR, f"{route['name']}_{message_id}_{stamp}.folded")
+            profiler.write(path)
+            logger.info(f"Profile for message {message_id} saved to {path} ({sum(profiler.samples.values())} samples)")
+            trace = current_trace()
+            if trace:
+                trace.root.set(profile=path)
+        except Exception as e:
+            logger.error(f"Error writing profile for message {message_id}: {e}")
+
+def enable_slow_callback_detection():
+    """
+    Увімкнути режим налагодження asyncio: колбеки, що блокують event loop
+    довше за SLOW_CALLBACK_MS, логуються з попередженням. Якщо профілювання
+    вимкнули в конфігурації, режим вимикається.
+    Викликати з працюючого event loop.
+    """
+    loop = asyncio.get_running_loop()
+    if not config.ENABLE_PROFILING:
+        if loop.get_debug():
+            loop.set_debug(False)
+            logger.info("Asyncio slow callback detection disabled")
+        return
+    loop.set_debug(True)
+    loop.slow_callback_duration = config.SLOW_CALLBACK_MS / 1000
+    logging.getLogger("asyncio").setLevel(logging.WARNING)
+    logger.info(f"Asyncio slow callback detection enabled ({config.SLOW_CALLBACK_MS} ms)")
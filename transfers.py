@@ -0,0 +1,263 @@
+import os
+import time
+import heapq
+import asyncio
+import itertools
+from contextlib import contextmanager, asynccontextmanager
+
+import config
+
+UP = "up"
+DOWN = "down"
+
+# Синхронні потоки звітують про трафік пачками, а не на кожні 8 КБ
+SYNC_CONSUME_QUANTUM = 256 * 1024
+
+def file_priority(file_name):
+    """Клас пріоритету файлу: менше число — вищий пріоритет."""
+    try:
+        return config.PRIORITY_FILES.index(file_name)
+    except ValueError:
+        return len(config.PRIORITY_FILES)
+
+class TokenBucket:
+    """Обмеження швидкості в байтах за секунду з запасом на одну секунду."""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, nbytes):
+        """Скільки секунд чекати, поки можна передати nbytes (великі шматки — в борг)."""
+        self._refill()
+        needed = min(nbytes, self.rate)
+        if self.tokens >= needed:
+            return 0
+        return (needed - self.tokens) / self.rate
+
+    def take(self, nbytes):
+        self.tokens -= nbytes
+
+class Transfer:
+    """Активна передача одного файлу, що тримає слот свого напрямку."""
+
+    def __init__(self, scheduler, direction, file_name, priority):
+        self.scheduler = scheduler
+        self.direction = direction
+        self.file_name = file_name
+        self.priority = priority
+        self._pending = 0
+
+    async def consume(self, nbytes):
+        """Дочекатися дозволу на передачу nbytes (з event loop)."""
+        await self.scheduler.consume(self.direction, nbytes, self.priority)
+
+    def consume_sync(self, nbytes, flush=False):
+        """Те саме з робочого потоку; трафік накопичується до SYNC_CONSUME_QUANTUM."""
+        if not self.scheduler.is_limited(self.direction):
+            return
+        self._pending += nbytes
+        if self._pending >= SYNC_CONSUME_QUANTUM or (flush and self._pending):
+            pending, self._pending = self._pending, 0
+            self.scheduler.call_sync(self.scheduler.consume, self.direction, pending, self.priority)
+
+class ThrottledFile:
+    """Файл для requests (data=...), читання якого обмежується планувальником."""
+
+    def __init__(self, file, transfer):
+        self._file = file
+        self._transfer = transfer
+
+    def __len__(self):
+        return os.fstat(self._file.fileno()).st_size - self._file.tell()
+
+    def read(self, size=-1):
+        data = self._file.read(size)
+        self._transfer.consume_sync(len(data), flush=not data)
+        return data
+
+class TransferScheduler:
+    """
+    Спільний для всіх маршрутів планувальник передач.
+    Для кожного напрямку (up/down): ліміт одночасних передач і смуга
+    пропускання. Слоти й смуга видаються за пріоритетом файлу, потім за чергою.
+    Стан живе в event loop; робочі потоки звертаються до нього через call_sync.
+    """
+
+    def __init__(self, limits_kib, max_active):
+        self._buckets = {direction: None for direction in limits_kib}
+        self._max_active = {}
+        self._active = {direction: 0 for direction in limits_kib}
+        self._slot_queue = {direction: [] for direction in limits_kib}
+        self._token_queue = {direction: [] for direction in limits_kib}
+        self._seq = itertools.count()
+        self._cond = None
+        self._loop = None
+        self.configure(limits_kib, max_active)
+
+    def configure(self, limits_kib, max_active):
+        """
+        Задати ліміти смуги й кількість одночасних передач (також після
+        перечитування конфігурації). Поточні передачі не перериваються.
+        """
+        for direction, limit in limits_kib.items():
+            bucket = self._buckets[direction]
+            if not limit:
+                self._buckets[direction] = None
+            elif bucket is None:
+                self._buckets[direction] = TokenBucket(limit * 1024)
+            else:
+                bucket.rate = limit * 1024
+                bucket.tokens = min(bucket.tokens, bucket.rate)
+        self._max_active.update(max_active)
+        # Очікувачі мають перевірити умови з новими лімітами
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(lambda: self._loop.create_task(self._notify_all()))
+
+    async def _notify_all(self):
+        async with self._cond:
+            self._cond.notify_all()
+
+    def bind_loop(self):
+        """Прив'язати планувальник до поточного event loop."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._cond = asyncio.Condition()
+        return self._cond
+
+    def is_limited(self, direction):
+        return self._buckets[direction] is not None
+
+    def _remove(self, queue, ticket):
+        if ticket in queue:
+            queue.remove(ticket)
+            heapq.heapify(queue)
+
+    async def acquire_slot(self, direction, priority):
+        cond = self.bind_loop()
+        queue = self._slot_queue[direction]
+        ticket = (priority, next(self._seq))
+
+        def ready():
+            max_active = self._max_active[direction]
+            return queue[0] == ticket and (not max_active or self._active[direction] < max_active)
+
+        async with cond:
+            heapq.heappush(queue, ticket)
+            try:
+                await cond.wait_for(ready)
+            except BaseException:
+                self._remove(queue, ticket)
+                cond.notify_all()
+                raise
+            heapq.heappop(queue)
+            self._active[direction] += 1
+            cond.notify_all()
+
+    async def release_slot(self, direction):
+        cond = self.bind_loop()
+        async with cond:
+            self._active[direction] -= 1
+            cond.notify_all()
+
+    async def consume(self, direction, nbytes, priority):
+        """Забрати nbytes зі смуги напрямку; першим обслуговується вищий пріоритет."""
+        if self._buckets[direction] is None or nbytes <= 0:
+            return
+        cond = self.bind_loop()
+        queue = self._token_queue[direction]
+        ticket = (priority, next(self._seq))
+        async with cond:
+            heapq.heappush(queue, ticket)
+            try:
+                while True:
+                    if queue[0] == ticket:
+                        # Ліміт могли змінити чи зняти під час очікування
+                        bucket = self._buckets[direction]
+                        wait = bucket.wait_time(nbytes) if bucket else 0
+                        if wait <= 0:
+                            if bucket:
+                                bucket.take(nbytes)
+                            heapq.heappop(queue)
+                            cond.notify_all()
+                            return
+                        try:
+                            await asyncio.wait_for(cond.wait(), wait)
+                        except asyncio.TimeoutError:
+                            pass
+                    else:
+                        await cond.wait()
+            except BaseException:
+                self._remove(queue, ticket)
+                cond.notify_all()
+                raise
+
+    def can_call_sync(self):
+        """
+        Чи можна з поточного потоку чекати на планувальник.
+        У потоці event loop (або без loop) обмеження пропускається, щоб не заблокуватися.
+        """
+        if self._loop is None or self._loop.is_closed():
+            return False
+        try:
+            asyncio.get_running_loop()
+            return False
+        except RuntimeError:
+            return True
+
+    def call_sync(self, coro_fn, *args):
+        """Виконати корутину планувальника з робочого потоку і дочекатися її."""
+        if not self.can_call_sync():
+            return None
+        return asyncio.run_coroutine_threadsafe(coro_fn(*args), self._loop).result()
+
+    @asynccontextmanager
+    async def transfer(self, direction, file_name):
+        """Слот для передачі файлу з event loop."""
+        priority = file_priority(file_name)
+        await self.acquire_slot(direction, priority)
+        try:
+            yield Transfer(self, direction, file_name, priority)
+        finally:
+            await self.release_slot(direction)
+
+    @contextmanager
+    def transfer_sync(self, direction, file_name):
+        """Слот для передачі файлу з робочого потоку (requests)."""
+        priority = file_priority(file_name)
+        acquired = self.can_call_sync()
+        if acquired:
+            self.call_sync(self.acquire_slot, direction, priority)
+        try:
+            yield Transfer(self, direction, file_name, priority)
+        finally:
+            if acquired:
+                self.call_sync(self.release_slot, direction)
+
+def scheduler_limits():
+    """Ліміти планувальника з поточної конфігурації."""
+    return (
+        {UP: config.UPLOAD_LIMIT_KIB, DOWN: config.DOWNLOAD_LIMIT_KIB},
+        {UP: config.MAX_CONCURRENT_UPLOADS, DOWN: config.MAX_CONCURRENT_DOWNLOADS}
+    )
+
+scheduler = TransferScheduler(*scheduler_limits())
+
+@config.on_reload
+def reconfigure_scheduler():
+    scheduler.configure(*scheduler_limits())
+
+async def run_blocking(func, *args, **kwargs):
+    """
+    Виконати блокуючу функцію (запити до GitHub) у робочому потоці,
+    щоб вона не зупиняла event loop і могла чекати на планувальник.
+    """
+    scheduler.bind_loop()
+    return await asyncio.to_thread(func, *args, **kwargs)
@@ -1,15 +1,15 @@
 import os
+import json
+import hashlib
 import tempfile
 import logging
 import asyncio
 import sys
-from telethon import TelegramClient
 
-from config import (
-    logger, API_ID, API_HASH, TELEGRAM_LOG_CHAT_ID, 
-    ENABLE_FILE_DOWNLOAD, CHECKER_SCRIPT_PATH,
-    TELEGRAM_TOKEN, TELEGRAM_GROUP_ID, TELEGRAM_TOPIC_ID
-)
+import config
+from config import logger, API_ID, API_HASH, TELEGRAM_TOKEN
+from tracing import span
+from transfers import scheduler, DOWN
 
 # Глобальний клієнт Telethon
 telethon_client = None
@@ -19,6 +19,8 @@ async def get_telethon_client():
     global telethon_client
     
     if telethon_client is None:
+        # Telethon потрібен лише для великих файлів і backfill — імпортуємо за потреби
+        from telethon import TelegramClient
         telethon_client = TelegramClient(
             "4ifir_release_bot_telethon",
             API_ID,
@@ -34,17 +36,18 @@ async def get_telethon_client():
         
     return telethon_client
 
-async def run_checker_script_async(message_id=None):
+async def run_checker_script_async(route, message_id=None):
     """
-    Запустити скрипт перевірки АСИНХРОННО.
+    Запустити скрипт перевірки маршруту АСИНХРОННО.
     Не блокує основний потік бота.
+    Повертає код завершення скрипта або None, якщо його не вдалося запустити.
     """
     try:
-        script_path = os.path.expanduser(CHECKER_SCRIPT_PATH)
+        script_path = os.path.expanduser(route["checker_script"])
         
         if not os.path.exists(script_path):
             logger.error(f"Скрипт перевірки не знайдено за шляхом: {script_path}")
-            return False
+            return None
         
         args = ['bash', script_path]
         if message_id is not None:
@@ -58,8 +61,8 @@ async def run_checker_script_async(message_id=None):
         if TELEGRAM_TOKEN: env["TELEGRAM_BOT_TOKEN"] = str(TELEGRAM_TOKEN)
         if API_ID: env["TELEGRAM_API_ID"] = str(API_ID)
         if API_HASH: env["TELEGRAM_API_HASH"] = str(API_HASH)
-        if TELEGRAM_GROUP_ID: env["YOUR_CHAT_ID"] = str(TELEGRAM_GROUP_ID)
-        if TELEGRAM_TOPIC_ID: env["TOPIC_ID"] = str(TELEGRAM_TOPIC_ID)
+        if route["group_id"]: env["YOUR_CHAT_ID"] = str(route["group_id"])
+        if route["topic_id"]: env["TOPIC_ID"] = str(route["topic_id"])
 
         # Використовуємо asyncio для запуску процесу
         process = await asyncio.create_subprocess_exec(
@@ -74,14 +77,29 @@ async def run_checker_script_async(message_id=None):
         
         if process.returncode == 0:
             logger.info(f"Скрипт перевірки успішно завершено.\nВивід:\n{stdout.decode()}")
-            return True
         else:
             logger.error(f"Скрипт перевірки завершився з помилкою (код {process.returncode}).\nПомилка: {stderr.decode()}")
-            return False
+        return process.returncode
             
     except Exception as e:
         logger.error(f"Помилка при запуску скрипта перевірки: {e}")
-        return False
+        return None
+
+def checker_cache_key(route, asset_hashes):
+    """
+    Ключ кешу перевірки: маршрут, відсортований набір (ім'я, sha256) ассетів
+    релізу та контрольна сума скрипта перевірки.
+    None, якщо щось із цього невідоме — тоді перевірка не кешується.
+    """
+    script_hash = file_sha256(os.path.expanduser(route["checker_script"]))
+    if not asset_hashes or script_hash is None or None in asset_hashes.values():
+        return None
+    payload = json.dumps({
+        "route": route["name"],
+        "assets": sorted(asset_hashes.items()),
+        "checker": script_hash
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
 
 # Зберігаємо стару назву для сумісності, але вона тепер викликає асинхронну версію
 # (хоча краще викликати run_checker_script_async напряму з handlers)
@@ -94,27 +112,33 @@ def run_checker_script(message_id=None):
 async def download_file(bot, message_obj, file_name):
     """Завантажити файл через Bot API або Telethon."""
     try:
-        if not ENABLE_FILE_DOWNLOAD:
+        if not config.ENABLE_FILE_DOWNLOAD:
             logger.info(f"Завантаження файлів вимкнено. Пропускаємо {file_name}.")
             return {"path": "dummy_path", "name": file_name}
         
-        # 1. Спроба Bot API
-        try:
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.zip') as temp_file:
-                temp_path = temp_file.name
-            
-            logger.info(f"Спроба завантажити {file_name} через Bot API...")
-            
-            file_id = message_obj.document.file_id
-            file_info = await bot.get_file(file_id)
-            await bot.download_file(file_info.file_path, temp_path)
-            
-            logger.info(f"Файл {file_name} завантажено через Bot API")
-            return {"path": temp_path, "name": file_name}
-            
-        except Exception as e:
-            logger.warning(f"Bot API не впорався ({e}). Переходимо на Telethon...")
-            return await download_file_telethon(bot, message_obj, file_name, temp_path)
+        # Слот завантаження видається за пріоритетом файлу
+        async with scheduler.transfer(DOWN, file_name) as transfer:
+            # 1. Спроба Bot API
+            try:
+                with tempfile.NamedTemporaryFile(delete=False, suffix='.zip') as temp_file:
+                    temp_path = temp_file.name
+                
+                logger.info(f"Спроба завантажити {file_name} через Bot API...")
+                
+                with span("bot_api_download", file=file_name):
+                    file_id = message_obj.document.file_id
+                    file_info = await bot.get_file(file_id)
+                    await bot.download_file(file_info.file_path, temp_path)
+                
+                logger.info(f"Файл {file_name} завантажено через Bot API")
+                return {"path": temp_path, "name": file_name}
+                
+            except Exception as e:
+                logger.warning(f"Bot API не впорався ({e}). Переходимо на Telethon...")
+                with span("telethon_download", file=file_name) as telethon_span:
+                    result = await download_file_telethon(bot, message_obj, file_name, temp_path, transfer)
+                    if not result: telethon_span.fail()
+                return result
             
     except Exception as e:
         logger.error(f"Помилка завантаження файлу {file_name}: {e}")
@@ -122,6 +146,16 @@ async def download_file(bot, message_obj, file_name):
             os.unlink(temp_path)
         return None
 
+def file_sha256(file_path):
+    """Порахувати SHA-256 файлу (None, якщо файлу немає)."""
+    if not os.path.exists(file_path):
+        return None
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
 def print_progress_bar(current, total, file_name):
     if total == 0: return
     percent = int(current * 100 / total)
@@ -135,7 +169,7 @@ def print_progress_bar(current, total, file_name):
 async def progress_callback(current, total, file_name):
     print_progress_bar(current, total, file_name)
 
-async def download_file_telethon(bot, message_obj, file_name, temp_path):
+async def download_file_telethon(bot, message_obj, file_name, temp_path, transfer=None):
     try:
         client = await get_telethon_client()
         chat_id = message_obj.chat.id
@@ -149,20 +183,39 @@ async def download_file_telethon(bot, message_obj, file_name, temp_path):
             if os.path.exists(temp_path): os.unlink(temp_path)
             return None
         
-        progress_func = lambda c, t: asyncio.create_task(progress_callback(c, t, file_name))
+        return await download_telethon_message(client, telethon_message, file_name, temp_path, transfer)
+    except Exception as e:
+        logger.error(f"Telethon помилка: {e}")
+        if os.path.exists(temp_path): os.unlink(temp_path)
+        return None
+
+async def download_telethon_message(client, telethon_message, file_name, temp_path=None, transfer=None):
+    """
+    Завантажити документ з уже отриманого повідомлення Telethon.
+    Файл читається шматками, кожен з яких проходить через планувальник передач.
+    """
+    try:
+        if temp_path is None:
+            with tempfile.NamedTemporaryFile(delete=False, suffix='.zip') as temp_file:
+                temp_path = temp_file.name
         
-        downloaded_path = await client.download_media(
-            telethon_message,
-            temp_path,
-            progress_callback=progress_func
-        )
+        total = telethon_message.file.size or 0
+        current = 0
+        with open(temp_path, 'wb') as f:
+            async for chunk in client.iter_download(telethon_message.document):
+                if transfer:
+                    await transfer.consume(len(chunk))
+                f.write(chunk)
+                current += len(chunk)
+                print_progress_bar(current, total, file_name)
         
-        if not downloaded_path:
+        if total and current != total:
+            logger.error(f"Telethon завантажив {current} з {total} байт для {file_name}")
             if os.path.exists(temp_path): os.unlink(temp_path)
             return None
             
-        return {"path": downloaded_path, "name": file_name}
+        return {"path": temp_path, "name": file_name}
     except Exception as e:
         logger.error(f"Telethon помилка: {e}")
-        if os.path.exists(temp_path): os.unlink(temp_path)
-        return None
\ No newline at end of file
+        if temp_path and os.path.exists(temp_path): os.unlink(temp_path)
+        return None